@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compare the memory used by 100k :class:`zeromail.Contact` instances against the
+old dictionary based contact (kept here for comparison), each built the way
+:meth:`zeromail.Extractor.parse` builds them.
+
+    python benchmarks/bench_contacts.py
+    python benchmarks/bench_contacts.py --contacts 500000
+"""
+
+import os
+import resource
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+FIRST_NAMES = ["Rob", "Phil", "Graham", "Scott", "Mark", "Aymeric", "Sarah", "Jane", "Tom", "Lucy"]
+LAST_NAMES = ["James", "Sim", "Lea", "Purcell", "Streatfield", "Smith", "Nguyen", "Brown", "Wilson", "Chen"]
+
+class LegacyContact(object):
+    """
+    The contact class as it used to be, attributes in a dictionary per
+    instance and phone numbers as a list of dictionaries.
+    """
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+def copy(value):
+    """
+    A new string equal to the given one, like the regexes give us for every match.
+    """
+
+    return "".join(list(value))
+
+def build(kind, count):
+    """
+    Build the contacts, a few fields each like a typical signature.
+    """
+
+    if kind == "legacy":
+        cls, phone = LegacyContact, lambda kind, number: {"type": kind, "number": number}
+    else:
+        import zeromail
+        cls, phone = zeromail.Contact, zeromail.PhoneNumber
+
+    contacts = []
+
+    for index in xrange(count):
+        first = copy(FIRST_NAMES[index % len(FIRST_NAMES)])
+        last = copy(LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)])
+        contact = cls(firstname=first, lastname=last, othernames=copy(""), email=["%s.%s%d@example.com" % (first, last, index)])
+        contact.phone = [phone(copy("work"), "02 %04d %04d" % (index % 10000, index // 10000))]
+        contacts.append(contact)
+
+    return contacts
+
+def child(kind, count):
+    """
+    Print how much the peak RSS (in KB) grew by building the contacts.
+    """
+
+    import zeromail # So the import isn't counted.
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    contacts = build(kind, count)
+    print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+def main(count):
+    results = {}
+
+    for kind in ("legacy", "slotted"):
+        output = subprocess.Popen([sys.executable, __file__, "--child", kind, str(count)], stdout=subprocess.PIPE).communicate()[0]
+        results[kind] = int(output)
+        print "%-8s %10d KB %10.1f KB per 100k contacts" % (kind, results[kind], results[kind] * 100000.0 / count)
+
+    print "saving   %10.1f%%" % (100.0 * (results["legacy"] - results["slotted"]) / results["legacy"])
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], int(sys.argv[3]))
+
+    else:
+        from optparse import OptionParser
+
+        parser = OptionParser(usage="usage: %prog [options]")
+        parser.add_option("--contacts", dest="contacts", type="int", default=100000, help="Number of contacts to build.")
+
+        options, args = parser.parse_args()
+        main(options.contacts)
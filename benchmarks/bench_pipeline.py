@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Time each stage of :meth:`zeromail.Extractor.parse` on its own, over a
+synthetic dump, reporting how quickly each gets through its input and the peak
+memory (RSS) of the process once it is done.  The stages are run in the same
+order as parse runs them with duplicates removed (and, with --remove-blocks,
+repeated blocks too), each one given the output of the last as a list so only
+its own work is timed.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --remove-blocks
+    python benchmarks/bench_pipeline.py --scan-cache 0
+    python benchmarks/bench_pipeline.py --min-score 3
+    python benchmarks/bench_pipeline.py --messages 50000 --format vcard
+
+See golden.py for checking the contacts found haven't changed.
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+import zeromail
+from dumpgen import DumpGenerator
+
+def timed(name, function, count):
+    """
+    Run a stage and print how it went.
+
+    :param count:
+        How many items (lines or contacts) the stage is working through.
+    :returns:
+        Whatever the stage returned.
+    """
+
+    start = time.time()
+    result = function()
+    elapsed = time.time() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    print "%-26s %10d %9.3fs %12.0f/s %9.1f MB" % (name, count, elapsed, count / elapsed if elapsed else 0, rss)
+
+    return result
+
+def main(messages, seed, format, threshold, remove_blocks, scan_cache, min_score):
+    directory = tempfile.mkdtemp()
+
+    try:
+        filename = os.path.join(directory, "emails.txt")
+        DumpGenerator(seed).write(filename, messages)
+
+        extract = zeromail.Extractor(scan_cache_size=scan_cache)
+        if min_score is not None:
+            extract.scorer = zeromail.SignatureScorer(min_score)
+
+        print "%d messages, %.1f MB" % (messages, os.path.getsize(filename) / 1024.0 / 1024.0)
+        print "%-26s %10s %10s %14s %12s" % ("stage", "items", "time", "rate", "peak RSS")
+
+        timed("load", lambda: extract.load(filename), sum([1 for line in open(filename)]))
+        lines = timed("_remove_thread_lines", lambda: list(extract._remove_thread_lines(extract._lines)), len(extract._lines))
+        frequency = timed("_count_lines", lambda: extract._count_lines(lines), len(lines))
+        lines = timed("_remove_duplicate_lines", lambda: list(extract._remove_duplicate_lines(lines, frequency, threshold)), len(lines))
+        if remove_blocks:
+            lines = timed("_remove_repeated_blocks", lambda: list(extract._remove_repeated_blocks(lines)), len(lines))
+        timed("_find_names", lambda: list(extract._find_names(lines)), len(lines))
+        timed("_find_signatures", lambda: extract._find_signatures(lines), len(lines))
+
+        if min_score is not None:
+            counts = extract.scorer.counts()
+            print "signatures kept %d, dropped %d, scores %s" % (counts["accepted"], counts["rejected"], ", ".join(["%d: %d" % item for item in sorted(counts["scores"].items())]))
+
+        output = open(os.devnull, "wb")
+        try:
+            timed("dump (%s)" % format, lambda: extract.dump(format, output), len(extract._contacts))
+        finally:
+            output.close()
+
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--messages", dest="messages", type="int", default=10000, help="Number of synthetic messages to parse.")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed for the dump generator.")
+    parser.add_option("--format", dest="format", type="choice", choices=["dict", "vcard", "ndjson"], default="ndjson", help="Format to dump the contacts in.")
+    parser.add_option("--threshold", dest="threshold", type="int", default=zeromail.HIGH_FREQUENCY_THRESHOLD, help="How often a line must appear to be removed as a duplicate.")
+    parser.add_option("--scan-cache", dest="scan_cache", type="int", default=zeromail.SCAN_CACHE_SIZE, help="How many signature lines to remember the fields of, 0 for none.")
+    parser.add_option("--min-score", dest="min_score", type="int", help="Score signatures, only keeping those scoring at least this.")
+    parser.add_option("--remove-blocks", dest="remove_blocks", action="store_true", default=False, help="Remove repeated blocks of lines too.")
+
+    options, args = parser.parse_args()
+    main(options.messages, options.seed, options.format, options.threshold, options.remove_blocks, options.scan_cache, options.min_score)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compare :meth:`zeromail.Extractor._scan_line` against calling each of the
+``_match_*`` methods in turn, checking they agree on every line.
+
+    python benchmarks/bench_scanner.py
+    python benchmarks/bench_scanner.py --messages 5000 --repeat 5
+"""
+
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+import zeromail
+from dumpgen import DumpGenerator
+
+# Lines the generator doesn't produce, to make sure every field gets a go.
+EXTRA_LINES = [
+    "Skype: graham.lea.belmont\n",
+    "skype: short\n",
+    "Twitter: @grahamlea\n",
+    "@grahamlea\n",
+    "Follow us on twitter - http://twitter.com/belmont\n",
+    "*Scott Purcell* | *H* smmpurcell@gmail.com | W *productivewebapps.com*\n",
+    "(M) 0413 889 940 (F) 02 8246 6383\n",
+    "Fax: +61 2 8246 6383\n",
+    "Cell/Mobile: 0413889940\n",
+    "m: +61413889940\n",
+    "http://www.mediaconnect.com.au/about\n",
+    "Call me on 1.800.555.1234 or 555.123.4567\n",
+    "PO Box 123, Fitzroy VIC 3065 Australia\n",
+    "12/34 Smith Rd. Brisbane QLD 4000 | Ph: 07 3333 4444\n",
+]
+
+def chained(extract, line):
+    """
+    The fields for a line the old way, one ``_match_*`` call after another.
+    """
+
+    return (extract._match_skype(line), extract._match_twitter(line), extract._match_phone(line),
+            extract._match_email(line), extract._match_url(line), extract._match_address(line))
+
+def timed(function, extract, lines, repeat):
+    best = None
+
+    for i in range(repeat):
+        start = time.time()
+        for line in lines:
+            function(extract, line)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+def main(messages, repeat):
+    lines = [line for line in DumpGenerator().lines(messages) if line.strip()] + EXTRA_LINES
+    extract = zeromail.Extractor()
+
+    for line in lines:
+        if chained(extract, line) != extract._scan_line(line):
+            print "MISMATCH: %r" % line
+            sys.exit(1)
+
+    old = timed(chained, extract, lines, repeat)
+    new = timed(zeromail.Extractor._scan_line, extract, lines, repeat)
+
+    print "%d lines, results identical" % len(lines)
+    print "%-10s %8.3fs %12.0f lines/s" % ("chained", old, len(lines) / old)
+    print "%-10s %8.3fs %12.0f lines/s" % ("scanner", new, len(lines) / new)
+    print "speedup    %8.2fx" % (old / new)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--messages", dest="messages", type="int", default=300, help="Number of synthetic messages to scan.")
+    parser.add_option("--repeat", dest="repeat", type="int", default=3, help="Number of timing runs, the best is reported.")
+
+    options, args = parser.parse_args()
+    main(options.messages, options.repeat)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Check how long it takes to start up, which matters when extract is run once
+per (small) file.  Times a dict mode run of scripts/extract over a small dump
+against the interpreter starting up and doing nothing, then lists the slowest
+imports of that run, like ``python -X importtime`` would on a newer Python.
+
+Fails if a dict mode run imports any of the modules that should only be
+imported when needed (see :data:`LAZY_MODULES`), so that doesn't creep back.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 20 --top 20
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+SCRIPT = os.path.join(ROOT, "scripts", "extract")
+sys.path.insert(0, HERE)
+
+# Modules a dict mode run has no business importing.
+LAZY_MODULES = ("cPickle", "gzip", "hashlib", "json", "mmap", "multiprocessing", "sqlite3", "zeromail_server")
+
+def child(filename):
+    """
+    Run the script over the file with every import timed, and print what was
+    imported (in the order they finished) with how long each took, including
+    anything it imported in turn.
+    """
+
+    import __builtin__
+
+    original = __builtin__.__import__
+    imports = []
+    depth = [0]
+
+    def timed_import(name, *args, **kwargs):
+        already = name in sys.modules
+        start = time.time()
+        depth[0] += 1
+
+        try:
+            return original(name, *args, **kwargs)
+
+        finally:
+            depth[0] -= 1
+            if not already and name in sys.modules:
+                imports.append((depth[0], name, time.time() - start))
+
+    __builtin__.__import__ = timed_import
+
+    start = time.time()
+    sys.argv = [SCRIPT, "-f", filename, "-d", "dict", "-o", os.devnull]
+    execfile(SCRIPT, {"__name__": "__main__"})
+    elapsed = time.time() - start
+
+    __builtin__.__import__ = original
+
+    print "total", elapsed
+    for depth, name, seconds in imports:
+        print "import", depth, name, seconds
+
+def environment():
+    """
+    The environment to run things in.  Bytecode is allowed to be written, so
+    we are timing a normal start up rather than compiling the module.
+    """
+
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env["PYTHONPATH"] = os.path.join(ROOT, "src")
+
+    return env
+
+def best(command, repeat):
+    """
+    :returns:
+        The quickest of a number of runs of the command, in seconds.
+    """
+
+    times = []
+
+    for i in range(repeat):
+        start = time.time()
+        subprocess.check_call(command, env=environment())
+        times.append(time.time() - start)
+
+    return min(times)
+
+def main(repeat, top):
+    from dumpgen import DumpGenerator
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        filename = os.path.join(directory, "emails.txt")
+        DumpGenerator().write(filename, 20)
+
+        extract = [sys.executable, SCRIPT, "-f", filename, "-d", "dict", "-o", os.devnull]
+        subprocess.check_call(extract, env=environment()) # Warm up, and write the bytecode.
+
+        nothing = best([sys.executable, "-c", "pass"], repeat)
+        run = best(extract, repeat)
+
+        print "%-30s %8.1f ms" % ("python doing nothing", nothing * 1000)
+        print "%-30s %8.1f ms" % ("extract -d dict, 20 messages", run * 1000)
+        print "%-30s %8.1f ms" % ("difference", (run - nothing) * 1000)
+        print
+
+        output = subprocess.Popen([sys.executable, __file__, "--child", filename], stdout=subprocess.PIPE, env=environment()).communicate()[0]
+        imports = []
+
+        for line in output.splitlines():
+            fields = line.split()
+            if fields[0] == "import":
+                imports.append((float(fields[3]), int(fields[1]), fields[2]))
+
+        print "%-30s %8s" % ("slowest imports (cumulative)", "ms")
+        for seconds, depth, name in sorted(imports, reverse=True)[:top]:
+            print "%-30s %8.2f" % ("  " * depth + name, seconds * 1000)
+
+        names = set([name for seconds, depth, name in imports])
+        imported = [module for module in LAZY_MODULES if module in names]
+
+    finally:
+        shutil.rmtree(directory)
+
+    if imported:
+        print
+        print "FAIL: a dict mode run imported %s" % ", ".join(imported)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2])
+
+    else:
+        from optparse import OptionParser
+
+        parser = OptionParser(usage="usage: %prog [options]")
+        parser.add_option("--repeat", dest="repeat", type="int", default=10, help="Number of timing runs, the best is reported.")
+        parser.add_option("--top", dest="top", type="int", default=10, help="Number of imports to list.")
+
+        options, args = parser.parse_args()
+        main(options.repeat, options.top)
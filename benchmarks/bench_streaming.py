@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Show that peak memory stays flat as the dump grows when streaming (either
+reading the file or memory mapping it), compared to reading the whole file in
+with :meth:`zeromail.Extractor.load`.
+
+Each run happens in a fresh child process so the peak RSS figures don't leak
+between sizes.  Run it like so:
+
+    python benchmarks/bench_streaming.py
+    python benchmarks/bench_streaming.py --sizes 1000,10000,100000
+"""
+
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+MODES = ("load", "stream", "mmap")
+
+def child(filename, mode):
+    """
+    Extract from the file and print the peak RSS (in KB) and elapsed time.
+    """
+
+    import zeromail
+
+    start = time.time()
+    extract = zeromail.Extractor()
+    extract.load(filename, stream=(mode == "stream"), mapped=(mode == "mmap"))
+    extract.parse()
+    elapsed = time.time() - start
+
+    print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed
+
+def run(filename, mode):
+    """
+    Run :func:`child` in a new interpreter.
+
+    :returns:
+        A tuple of the peak RSS in KB and the elapsed time in seconds.
+    """
+
+    output = subprocess.Popen([sys.executable, __file__, "--child", filename, mode],
+                              stdout=subprocess.PIPE).communicate()[0]
+    rss, elapsed = output.split()
+
+    return int(rss), float(elapsed)
+
+def main(sizes):
+    from dumpgen import DumpGenerator
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        print "%10s %8s" % ("messages", "MB") + "".join(["%12s" % ("%s KB" % mode) for mode in MODES]) + "".join(["%10s" % ("%s s" % mode) for mode in MODES])
+
+        for size in sizes:
+            filename = os.path.join(directory, "emails-%d.txt" % size)
+            DumpGenerator().write(filename, size)
+            megabytes = os.path.getsize(filename) / 1024.0 / 1024.0
+
+            results = [run(filename, mode) for mode in MODES]
+
+            print "%10d %8.1f" % (size, megabytes) + "".join(["%12d" % rss for rss, elapsed in results]) + "".join(["%10.2f" % elapsed for rss, elapsed in results])
+
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], sys.argv[3])
+
+    else:
+        from optparse import OptionParser
+
+        parser = OptionParser(usage="usage: %prog [options]")
+        parser.add_option("--sizes", dest="sizes", default="1000,2000,4000,8000", help="Comma separated list of dump sizes, in messages.")
+
+        options, args = parser.parse_args()
+        main([int(size) for size in options.sizes.split(",")])
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Time the signature pass over a memory mapped dump with and without NumPy
+picking out the lines worth looking at (see
+:meth:`zeromail.MappedFile.candidate_lines`), checking the contacts found are
+the same.  The messages are wordier than usual, as real discussions are, which
+is where it helps.  Needs NumPy.
+
+    python benchmarks/bench_vectorised.py
+    python benchmarks/bench_vectorised.py --messages 20000 --sentences 20,60
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+import zeromail
+from dumpgen import DumpGenerator
+
+def run(filename, vectorise):
+    """
+    Parse the file, timing just the signature pass.
+
+    :returns:
+        A tuple of the time taken, the lines left out and the contacts found.
+    """
+
+    extract = zeromail.Extractor(stats=True)
+    extract.vectorise = vectorise
+    extract.load(filename, mapped=True)
+    extract.parse()
+
+    contacts = [contact.dump("dict") for contact in extract._contacts]
+
+    return extract.stats.timings["signatures"], extract.stats.counters.get("masked_lines", 0), contacts
+
+def main(messages, sentences):
+    directory = tempfile.mkdtemp()
+
+    try:
+        filename = os.path.join(directory, "emails.txt")
+        DumpGenerator(sentences=sentences).write(filename, messages)
+        lines = sum([1 for line in open(filename)])
+
+        print "%d messages, %d lines, %.1f MB" % (messages, lines, os.path.getsize(filename) / 1024.0 / 1024.0)
+
+        plain, masked, expected = run(filename, False)
+        print "%-12s %8.3fs" % ("per line", plain)
+
+        vectorised, masked, contacts = run(filename, True)
+        print "%-12s %8.3fs %10d lines left out" % ("numpy", vectorised, masked)
+
+        if contacts != expected:
+            print "MISMATCH: the contacts found differ"
+            sys.exit(1)
+
+        print "speedup      %8.2fx, results identical" % (plain / vectorised)
+
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--messages", dest="messages", type="int", default=5000, help="Number of synthetic messages to parse.")
+    parser.add_option("--sentences", dest="sentences", default="20,60", help="Least and most sentences in a message, comma separated.")
+
+    options, args = parser.parse_args()
+    main(options.messages, tuple([int(count) for count in options.sentences.split(",")]))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Generate synthetic email dumps that look (roughly) like data/emails.txt, so the
+benchmarks have something of a known size to chew on.  Messages have quoted
+threads, both styles of "wrote:" header, the Google Groups footer and the
+signature styles from the README (long, condensed and all on one line), some
+with an address.
+
+    python benchmarks/dumpgen.py emails.txt
+    python benchmarks/dumpgen.py --messages 100000 --seed 1 emails.txt
+"""
+
+from __future__ import with_statement
+
+import random
+
+FIRST_NAMES = ["Rob", "Phil", "Graham", "Scott", "Mark", "Aymeric", "Sarah", "Jane", "Tom", "Lucy"]
+LAST_NAMES = ["James", "Sim", "Lea", "Purcell", "Streatfield", "Smith", "Nguyen", "Brown", "Wilson", "Chen"]
+DOMAINS = ["gmail.com", "mediaconnect.com.au", "belmonttechnology.com.au", "example.com.au"]
+TITLES = ["Chief Executive Officer,", "Founder", "Director", "Head of Product"]
+COMPANIES = ["MediaConnect Australia Pty Ltd", "Belmont Technology Pty Ltd", "Productive Web Apps"]
+LOCALITIES = ["Sydney NSW 2000", "Surry Hills NSW 2010", "Melbourne VIC 3000", "Fortitude Valley QLD 4006"]
+SIGNOFFS = ["Cheers", "Regards", "Thanks", "Kind Regards", "rgds", "Best regards", "Many thanks"]
+WORDS = ("the quick brown fox jumps over a lazy dog while we talk about startups "
+         "funding pitch investors sydney melbourne product launch customers").split()
+
+class DumpGenerator(object):
+    """
+    Generates the lines of a fake mailing list dump.  The output is entirely
+    determined by the seed, so two runs with the same arguments give the same
+    file.
+    """
+
+    def __init__(self, seed=0, people=50, sentences=(2, 6)):
+        """
+        Initialise the object.
+
+        :param seed:
+            Seed for the random number generator.
+        :param people:
+            How many different people are posting to the list.
+        :param sentences:
+            The least and most sentences (lines) in the body of a message.
+        """
+
+        self._random = random.Random(seed)
+        self._sentences = sentences
+        self._people = []
+
+        for index in range(people):
+            first = FIRST_NAMES[index % len(FIRST_NAMES)]
+            last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            domain = DOMAINS[index % len(DOMAINS)]
+            email = "%s.%s%d@%s" % (first.lower(), last.lower(), index, domain)
+            self._people.append((first, last, email, index))
+
+    def _sentence(self):
+        return " ".join(self._random.choice(WORDS) for i in range(self._random.randint(12, 20))).capitalize() + "."
+
+    def _signature(self, person):
+        first, last, email, index = person
+        domain = email.split("@")[1]
+
+        # Some people sign with another address to the one they write from.
+        if index % 3 == 2:
+            email = "%s@work%d.%s" % (first.lower(), index, domain)
+        style = index % 4
+
+        if style == 1:
+            # Long and detailed.
+            return ["%s %s" % (first, last), TITLES[index % len(TITLES)], COMPANIES[index % len(COMPANIES)],
+                    "Level %d, %d George Street" % (index % 40 + 1, index + 1), LOCALITIES[index % len(LOCALITIES)],
+                    "www.%s" % domain, email, "Ph: +61 2 %04d %04d" % (index, index * 7 % 10000),
+                    "Fax: +61 2 8246 %04d" % index, "Mobile: 04%08d" % (index * 7919 % 100000000)]
+
+        if style == 2:
+            # Condensed.
+            return ["%s %s" % (first, last), COMPANIES[index % len(COMPANIES)], email]
+
+        if style == 3:
+            # All on the one line.
+            return ["*%s %s* | *H* %s | W *%s*" % (first, last, email, domain)]
+
+        lines = ["%s %s" % (first, last)]
+
+        if index % 3 == 0:
+            lines.append("www.%s" % domain)
+        lines.append(email)
+        lines.append("Ph: +61 2 %04d %04d" % (index, index * 7 % 10000))
+        if index % 2 == 0:
+            lines.append("Mobile: 04%02d %03d %03d" % (index % 100, index % 1000, index * 3 % 1000))
+        if index % 5 == 0:
+            lines.append("Skype: %s%s%d" % (first.lower(), last.lower(), index))
+        if index % 3 == 1:
+            # Dumps aren't always ASCII, so some of the streets have an accent.
+            street = "Caf\xe9 Street" if index % 6 == 4 else "Crown St"
+            lines.append("%d %s, %s" % (index + 1, street, LOCALITIES[index % len(LOCALITIES)]))
+
+        return lines
+
+    def message(self):
+        """
+        Return the lines (without line endings) for one message in the thread.
+        """
+
+        person = self._random.choice(self._people)
+        previous = self._random.choice(self._people)
+        lines = []
+
+        for i in range(self._random.randint(*self._sentences)):
+            lines.append(self._sentence())
+        lines.append("")
+        lines.append(self._random.choice(SIGNOFFS))
+        lines.extend(self._signature(person))
+        lines.append("")
+        if self._random.random() < 0.8:
+            lines.append("On Jun 15, 9:06 am, %s %s <%s> wrote:" % previous[:3])
+        else:
+            lines.append("On Wed, Jun 15, 2011 at 10:40 PM, %s %s <%s>wrote:" % previous[:3])
+        for i in range(self._random.randint(1, 4)):
+            lines.append("> " + self._sentence())
+        lines.append("")
+        lines.append("--")
+        lines.append("You received this message because you are subscribed to the Google Groups \"Silicon Beach Australia\" group.")
+        lines.append("To post to this group, send email to silicon-beach-australia@googlegroups.com.")
+        lines.append("")
+
+        return lines
+
+    def lines(self, messages):
+        """
+        Generate the lines (with line endings) for the given number of messages.
+        """
+
+        for i in xrange(messages):
+            for line in self.message():
+                yield line + "\n"
+
+    def write(self, filename, messages):
+        """
+        Write a dump of the given number of messages to disk.
+        """
+
+        with open(filename, "w") as fd:
+            fd.writelines(self.lines(messages))
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options] FILE")
+    parser.add_option("--messages", dest="messages", type="int", default=10000, help="Number of messages to generate.")
+    parser.add_option("--people", dest="people", type="int", default=50, help="Number of different people posting.")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="Seed for the random number generator.")
+
+    options, args = parser.parse_args()
+
+    if len(args) != 1:
+        parser.error("Expected the name of the file to write.")
+
+    DumpGenerator(options.seed, options.people).write(args[0], options.messages)
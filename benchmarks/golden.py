@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Check the contacts found in a few synthetic dumps against the known good
+output in benchmarks/golden, so speeding things up can't quietly change what
+gets extracted.  Every way of loading and parsing (in memory, streamed, memory
+mapped and in parallel) must give exactly the same contacts, as must resuming
+from a checkpoint half way through and extracting from the messages in a batch
+with extract_many (except when removing duplicates, which those can't do the
+same way).
+
+    python benchmarks/golden.py
+    python benchmarks/golden.py --update
+
+Only use --update when a change to the output is intended, and check the diff.
+"""
+
+from __future__ import with_statement
+
+import cStringIO
+import os
+import shutil
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+import zeromail
+from dumpgen import DumpGenerator
+
+GOLDEN = os.path.join(HERE, "golden")
+
+# Name, seed and messages for each dump, and the arguments to parse it with.
+CASES = [
+    ("default", 0, 2000, {}),
+    ("remove-duplicates", 1, 2000, {"remove_duplicate": True, "threshold": 50}),
+]
+
+# The arguments to load the dump with, and extra arguments to parse it with.
+MODES = [
+    ("load", {}, {}),
+    ("stream", {"stream": True}, {}),
+    ("mmap", {"mapped": True}, {}),
+    ("jobs", {"stream": True}, {"jobs": 2}),
+]
+
+def extract(filename, load, parse):
+    """
+    :returns:
+        The contacts found in the file, as ndjson.
+    """
+
+    extractor = zeromail.Extractor()
+    extractor.load(filename, **load)
+    extractor.parse(**parse)
+
+    output = cStringIO.StringIO()
+    extractor.dump("ndjson", output)
+
+    return output.getvalue()
+
+def split_messages(lines):
+    """
+    :returns:
+        The position of the first line of each message, a message's body
+        starts after the Google Groups footer of the one before.
+    """
+
+    return [0] + [position for position in range(2, len(lines)) if not lines[position - 1].strip() and lines[position - 2].startswith("To post to this group")]
+
+def extract_resumed(filename, parse):
+    """
+    Parse the first half of the messages with a checkpoint, then append the
+    rest and parse again from the checkpoint, like a nightly run would.
+
+    :returns:
+        The contacts found, as ndjson.
+    """
+
+    with open(filename, "rb") as fd:
+        lines = fd.readlines()
+
+    starts = split_messages(lines)
+    middle = starts[len(starts) // 2]
+
+    resumed = filename + ".resumed"
+    checkpoint = filename + ".checkpoint"
+
+    with open(resumed, "wb") as fd:
+        fd.writelines(lines[:middle])
+    extract(resumed, {"stream": True}, dict(parse, checkpoint=checkpoint))
+
+    with open(resumed, "ab") as fd:
+        fd.writelines(lines[middle:])
+
+    return extract(resumed, {"stream": True}, dict(parse, checkpoint=checkpoint))
+
+def extract_batch(filename):
+    """
+    Extract from each message of the file in one batch, see
+    :meth:`zeromail.Extractor.extract_many`.
+
+    :returns:
+        The contacts found, as ndjson.
+    """
+
+    with open(filename, "rb") as fd:
+        lines = fd.readlines()
+
+    starts = split_messages(lines) + [len(lines)]
+
+    extractor = zeromail.Extractor()
+    extractor.extract_many(messages=["".join(lines[start:end]) for start, end in zip(starts, starts[1:])])
+
+    output = cStringIO.StringIO()
+    extractor.dump("ndjson", output)
+
+    return output.getvalue()
+
+def main(update):
+    directory = tempfile.mkdtemp()
+    failed = False
+
+    try:
+        for name, seed, messages, parse in CASES:
+            filename = os.path.join(directory, "%s.txt" % name)
+            DumpGenerator(seed).write(filename, messages)
+            golden = os.path.join(GOLDEN, "%s.ndjson" % name)
+
+            if update:
+                with open(golden, "wb") as fd:
+                    fd.write(extract(filename, {}, parse))
+
+                print "%-20s updated" % name
+                continue
+
+            with open(golden, "rb") as fd:
+                expected = fd.read()
+
+            for mode, load, extra in MODES:
+                arguments = dict(parse)
+                arguments.update(extra)
+                ok = extract(filename, load, arguments) == expected
+                failed = failed or not ok
+
+                print "%-20s %-8s %s" % (name, mode, "ok" if ok else "CHANGED")
+
+            if not parse.get("remove_duplicate"):
+                for mode, function in (("resume", lambda: extract_resumed(filename, parse)), ("batch", lambda: extract_batch(filename))):
+                    ok = function() == expected
+                    failed = failed or not ok
+
+                    print "%-20s %-8s %s" % (name, mode, "ok" if ok else "CHANGED")
+
+    finally:
+        shutil.rmtree(directory)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("--update", dest="update", action="store_true", default=False, help="Rewrite the golden files from the current output.")
+
+    options, args = parser.parse_args()
+    main(options.update)
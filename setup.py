@@ -30,8 +30,7 @@ setup(
     author_email="mstreatfield@gmail.com",
     url="https://github.com/mstreatfield/zeromail",
     package_dir={"": "src"},
-    py_modules=["zeromail"],
+    py_modules=["zeromail", "zeromail_server"],
     scripts=["scripts/extract"],
-    data_files=[("data", ["data/emails.txt"])],
-    requires=["vobject (==0.8.1)"]
+    data_files=[("data", ["data/emails.txt"])]
 )
@@ -22,12 +22,150 @@
 
 from __future__ import with_statement
 
+import array
+import collections
+import contextlib
+import os
 import re
-import vobject
+import sys
+import time
+
+# Anything else (cPickle, gzip, hashlib, json, mmap, multiprocessing) is imported
+# where it is used.  Most runs never need them, and they add up at start up.
+
+class LazyPattern(object):
+    """
+    A regular expression that isn't compiled until it is first used, so we
+    don't pay for compiling patterns (the phone one especially) that a run
+    never needs.  Use the methods rather than passing it to the :mod:`re`
+    functions.
+    """
+    
+    def __init__(self, pattern, flags=0):
+        """
+        Initialise the object.
+        
+        :param pattern:
+            The regular expression.
+        :param flags:
+            Flags to compile it with.
+        """
+        
+        self.pattern = pattern
+        self.flags = flags
+    
+    def __getattr__(self, name):
+        
+        # Only called for attributes we don't have yet.  Compile the pattern and
+        # keep its methods, so from now on they are found straight away.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        
+        compiled = re.compile(self.pattern, self.flags)
+        
+        for attribute in ("search", "match", "finditer", "findall", "sub", "split"):
+            setattr(self, attribute, getattr(compiled, attribute))
+        
+        return getattr(compiled, name)
 
 # Some useful constants.
 THREAD_IDENTIFIER = ">"
 HIGH_FREQUENCY_THRESHOLD = 90
+SKETCH_WIDTH = 2 ** 20 # Counters per row of a :class:`CountMinSketch`.
+SKETCH_DEPTH = 4 # Rows in a :class:`CountMinSketch`.
+SHARDS_PER_JOB = 4 # How many pieces to split the input in to, per parallel job.
+BLOCK_LINES = 3 # How many lines in a row make a block, see :meth:`Extractor._remove_repeated_blocks`.
+BLOCK_CACHE_SIZE = 100000 # How many blocks we remember having seen.
+BLOCK_HASH_BASE = 1000003 # Multiplier for the rolling hash over a block's lines.
+BLOCK_HASH_MODULUS = 2 ** 61 - 1
+CANDIDATE_CHUNK_SIZE = 2 ** 22 # Bytes of a file classified at a time by :meth:`MappedFile.candidate_lines`.
+SCAN_CACHE_SIZE = 10000 # How many lines :meth:`Extractor._find_signatures` remembers the fields of.
+WRITER_BATCH_SIZE = 1000 # How many contacts a :class:`ContactWriter` buffers between writes.
+CHECKPOINT_VERSION = 1 # Bumped whenever what goes in to a checkpoint changes.
+CHECKPOINT_SAMPLE_SIZE = 4096 # Bytes before the checkpointed offset used to recognise the file.
+INDEX_VERSION = 1 # Bumped whenever what goes in to a :class:`MessageIndex` file changes.
+INDEX_SUFFIX = ".index" # A dump's message index is kept next to it, with this on the end.
+VCARD_LINE_LIMIT = 75 # vCard lines longer than this (in bytes) are folded.
+VCARD_PHONE_TYPES = {"mobile": "CELL", "fax": "FAX", "work": "WORK"}
+PHONE_NUMBER_TYPES = { # What comes before a phone number -> the type of number, anything else is "work".
+    "(M) ": "mobile", "Cell/Mobile: ": "mobile", "m: ": "mobile", "Mobile: ": "mobile", " M ": "mobile",
+    "(F) ": "fax", "f: ": "fax", "Fax: ": "fax", " F ": "fax",
+}
+RESOLVE_FIELDS = ("email", "phone", "skype", "twitter") # Contacts sharing any of these are merged, see :class:`ContactResolver`.
+DEFAULT_COUNTRY_CODE = "61" # Phone numbers starting with a single 0 are taken to be local (Australian).
+PHONE_KEY_MIN_DIGITS = 8 # Shorter phone numbers are too likely to be junk to merge on.
+ADDRESS_STREET_WORDS = 4 # Max words in a street's name, between the number and the type.
+ADDRESS_SUBURB_WORDS = 3 # Max words in a suburb's name.
+ADDRESS_UNITS = frozenset(("level", "suite", "unit", "shop", "floor")) # Can come before a street number, "Level 5, 123 George St".
+
+# Some useful limits for spotting signatures.
+SIGNOFF_LINE_LENGTH_LIMIT = 3 # Max words on a line that starts a signature.
+SIGNATURE_LINE_LENGTH_LIMIT = 10 # Max words on a line inside a signature.
+SIGNATURE_LINE_COUNT_LIMIT = 15 # Max lines in a signature.
+SIGNOFF_WINDOW = 3 # How many lines before a signature are looked at for a signoff.
+SIGNATURE_SCORE_THRESHOLD = 3 # What a signature must score to be kept, see :class:`SignatureScorer`.
+SIGNATURE_SCORE_WEIGHTS = {
+    "signoff": 2, # A signoff just before it.
+    "name": 1, # Its first line is the contact's name, and nothing else.
+    "field": 1, # For each kind of field (email, phone etc.) found in it.
+    "prose": -1, # For each line that reads like a sentence rather than a detail.
+}
+# The Australian states and territories, their postcodes and the street types, for
+# spotting postal addresses, see :class:`Gazetteer`.  One entry per line:
+#    state <abbreviation> <name>
+#    postcode <first> <last> <state abbreviation>
+#    street <type> <abbreviations...>
+GAZETTEER = """
+state NSW New South Wales
+state VIC Victoria
+state QLD Queensland
+state SA South Australia
+state WA Western Australia
+state TAS Tasmania
+state NT Northern Territory
+state ACT Australian Capital Territory
+
+postcode 0200 0299 ACT
+postcode 0800 0999 NT
+postcode 1000 2599 NSW
+postcode 2600 2618 ACT
+postcode 2619 2899 NSW
+postcode 2900 2920 ACT
+postcode 2921 2999 NSW
+postcode 3000 3999 VIC
+postcode 4000 4999 QLD
+postcode 5000 5999 SA
+postcode 6000 6999 WA
+postcode 7000 7999 TAS
+postcode 8000 8999 VIC
+postcode 9000 9999 QLD
+
+street Street St
+street Road Rd
+street Avenue Ave Av
+street Lane Ln
+street Place Pl
+street Drive Dr
+street Parade Pde
+street Crescent Cres Cr
+street Court Ct
+street Terrace Tce
+street Highway Hwy
+street Boulevard Blvd
+street Close Cl
+street Circuit Cct
+street Square Sq
+street Esplanade Esp
+street Grove Gr
+street Parkway Pkwy
+street Arcade Arc
+street Way
+street Walk
+street Mall
+street Quay
+street Row
+"""
+
 POSSIBLE_SIGNOFFS = [
                      "regards", 
                      "cheers", 
@@ -40,10 +178,10 @@ POSSIBLE_SIGNOFFS = [
 
 # Compile some regular expressions that we know we're going to use frequently 
 # later on in the code.
-EMAIL_HEADER_REGEX = re.compile("(?P<name>[a-zA-Z][a-zA-Z0-9 ]+) <(?P<email>[a-zA-Z0-9.-_]+[a-zA-Z0-9-_]@[a-zA-Z0-9._-]+.[a-zA-Z0-9._-]+)> wrote:")
-RELAXED_HEADER_REGEX = re.compile("(?P<name>[a-zA-Z][a-zA-Z0-9 ]+) <?(?P<email>[a-zA-Z0-9.-_]+@[a-zA-Z0-9._-]+.[a-zA-Z0-9._-]+)>? (wrote:)?")
-SKYPE_USERNAME_REGEX = re.compile("[Ss]kype:\s*(?P<skype>[a-zA-Z][a-zA-Z0-9-_,.]{5,32})") # http://forum.skype.com/index.php?showtopic=527951
-TWITTER_USERNAME_REGEX = re.compile("([Tt]witter.*:|(?=^@))\s*(?P<twitter>@?[a-zA-Z_.]{1,15})") #
+EMAIL_HEADER_REGEX = LazyPattern("(?P<name>[a-zA-Z][a-zA-Z0-9 ]+) <(?P<email>[a-zA-Z0-9.-_]+[a-zA-Z0-9-_]@[a-zA-Z0-9._-]+.[a-zA-Z0-9._-]+)> wrote:")
+RELAXED_HEADER_REGEX = LazyPattern("(?P<name>[a-zA-Z][a-zA-Z0-9 ]+) <?(?P<email>[a-zA-Z0-9.-_]+@[a-zA-Z0-9._-]+.[a-zA-Z0-9._-]+)>? (wrote:)?")
+SKYPE_USERNAME_REGEX = LazyPattern("[Ss]kype:\s*(?P<skype>[a-zA-Z][a-zA-Z0-9-_,.]{5,32})") # http://forum.skype.com/index.php?showtopic=527951
+TWITTER_USERNAME_REGEX = LazyPattern("([Tt]witter.*:|(?=^@))\s*(?P<twitter>@?[a-zA-Z_.]{1,15})") #
 PHONE_REGEX_STRING = """
     (?P<type>([a-zA-Z:()./ *]+)|^)\s*(?P<number>
     ([0-9]{4}\s[0-9]{3}\s[0-9]{3})|
@@ -51,7 +189,6 @@ PHONE_REGEX_STRING = """
     ([0-9]{10})|
     (\(\+[0-9]{2}\)\s[0-9]{4}\s[0-9]{3}\s[0-9]{3})|
     (\+\s[0-9]{2}\s\([0-9]\)\s[0-9]{3}\s[0-9]{3}\s[0-9]{3})|
-    ([0-9]{4}\s[0-9]{3}\s[0-9]{3})|
     ([0-9]{4}\s[0-9]{6})|
     (\+[0-9]{2}\s[0-9]{3}\s[0-9]{3}\s[0-9]{3})|
     (\+[0-9]{11})|
@@ -59,14 +196,26 @@ PHONE_REGEX_STRING = """
     ([0-9]{4}\s[0-9]\s[0-9]{5})|
     ([0-9]{3}\.[0-9]{3}\.[0-9]{4})|
     ([0-9]{4}\.[0-9]{3}\.[0-9]{3})|
-    ([0-9]{4}\s[0-9]{3}\s[0-9]{3})|
     ([0-9]{2}\s[0-9]{4}\s[0-9]{4})|
     ([0-9]{4}\s[0-9]{4})|
     (\([0-9]{2}\)\s[0-9]{4}\s[0-9]{4})
 )"""
-PHONE_REGEX = re.compile(PHONE_REGEX_STRING, re.X) # OK, THIS ONE IS LAME (but I am bored now).
-EMAIL_REGEX = re.compile("(?P<email>[a-zA-Z0-9-_.]+@[a-zA-Z0-9-_.]+\.[a-zA-Z]+)")
-URL_RE = re.compile("(?P<url>((https?://)|(www\.))?[a-zA-Z]+\.[a-zA-Z./]+)")
+PHONE_REGEX = LazyPattern(PHONE_REGEX_STRING, re.X) # OK, THIS ONE IS LAME (but I am bored now).
+EMAIL_REGEX = LazyPattern("(?P<email>[a-zA-Z0-9-_.]+@[a-zA-Z0-9-_.]+\.[a-zA-Z]+)")
+DIGIT_REGEX = LazyPattern("[0-9]")
+NON_BLANK_REGEX = LazyPattern("\S")
+NON_DIGIT_REGEX = LazyPattern("[^0-9]")
+ADDRESS_WORD_REGEX = LazyPattern("[^\s,|]+")
+STREET_NUMBER_REGEX = LazyPattern("[0-9]+[a-zA-Z]?([/-][0-9]+[a-zA-Z]?)?$")
+PO_BOX_REGEX = LazyPattern("\\b(G?PO|G?P\\.O\\.|Locked)\\s+(Box|Bag)\\s+[0-9]+")
+URL_RE = LazyPattern("(?P<url>((https?://)|(www\.))?[a-zA-Z]+\.[a-zA-Z./]+)")
+
+# The contact attributes (or combinations of) that :class:`ContactsList` keeps an
+# index for, most selective first.
+CONTACT_INDEXES = (("email",), ("firstname", "lastname"), ("firstname",))
+
+# Marker for a missing value, as None is a perfectly good attribute value.
+_MISSING = object()
 
 class STATES(object):
     """
@@ -75,35 +224,94 @@ class STATES(object):
     
     OUTSIDE_SIGNATURE, INSIDE_SIGNATURE = range(0, 2)
 
+# A phone number found in a signature, type is one of "mobile", "fax" or "work".
+PhoneNumber = collections.namedtuple("PhoneNumber", "type number")
+
 class Contact(object):
     """
     Class for storing out contact details.
+    
+    We can end up holding a lot of these, so the fields are fixed (see
+    :attr:`FIELDS`) and stored in slots rather than a dictionary per contact.
+    A field that hasn't been found is None.  Name and handle strings are
+    interned, as the same few names turn up over and over again.
     """
     
+    FIELDS = ("firstname", "lastname", "othernames", "skype", "twitter", "email", "url", "phone", "address")
+    INTERNED_FIELDS = frozenset(("firstname", "lastname", "othernames", "skype", "twitter"))
+    
+    __slots__ = FIELDS + ("_owners",)
+    
     def __init__(self, **kwargs):
         """
         Initialise the object.
+        
+        :param kwargs:
+            Initial values for any of the :attr:`FIELDS`.
         """
         
+        # The lists we belong to, so they can be told when we change.
+        object.__setattr__(self, "_owners", [])
+        
+        for key in self.FIELDS:
+            object.__setattr__(self, key, None)
+        
         for key, value in kwargs.items():
             setattr(self, key, value)
     
+    def __setattr__(self, key, value):
+        
+        if key in self.INTERNED_FIELDS and type(value) is str:
+            value = intern(value)
+        
+        object.__setattr__(self, key, value)
+        
+        for owner in self._owners:
+            owner._reindex(self)
+    
+    def __delattr__(self, key):
+        
+        # Slots can't go missing, so deleting a field just resets it.
+        setattr(self, key, None)
+    
+    def __getstate__(self):
+        
+        # Our owners are not ours to pickle, they'll find us again when we're added back.
+        return dict((key, getattr(self, key)) for key in self.FIELDS)
+    
+    def __setstate__(self, state):
+        
+        object.__setattr__(self, "_owners", [])
+        
+        for key in self.FIELDS:
+            value = state.get(key)
+            if key in self.INTERNED_FIELDS and type(value) is str:
+                value = intern(value)
+            
+            object.__setattr__(self, key, value)
+    
     def __str__(self):
         
-        return "<Contact %s>" % " ".join(["%s -> %s" % (key, getattr(self, key)) for key in ("firstname", "lastname") if hasattr(self, key)])
+        return "<Contact %s>" % " ".join(["%s -> %s" % (key, getattr(self, key)) for key in ("firstname", "lastname") if getattr(self, key) is not None])
     
     def dump(self, format="vcard"):
         """
         Make a vCard for this contact.
+        
+        :param format:
+            One of "vcard", "dict" or "ndjson".
         """
         
-        if format in "vcard":
+        if format == "vcard":
             return self._dump_vcard()
         
-        elif format in "dict":
+        elif format == "dict":
             return self._dump_dict()
         
-        raise Exception("Other formats not yet supported, please only use vcard or dict")
+        elif format == "ndjson":
+            return self._dump_json()
+        
+        raise Exception("Other formats not yet supported, please only use vcard, dict or ndjson")
     
     def _dump_dict(self):
         """
@@ -112,237 +320,3024 @@ class Contact(object):
         
         data = {}
         
-        for attribute in ("skype", "twitter", "email", "url", "phone", "firstname", "lastname", "othernames"):
-            data[attribute] = None
-            
-            if hasattr(self, attribute):
-                data[attribute] = getattr(self, attribute)
+        for attribute in ("skype", "twitter", "email", "url", "phone", "address", "firstname", "lastname", "othernames"):
+            data[attribute] = getattr(self, attribute)
+        
+        if self.phone is not None:
+            data["phone"] = [{"type": number.type, "number": number.number} for number in self.phone]
         
         return data
     
-    def _dump_vcard(self):
+    def _dump_json(self):
+        """
+        Dump contact as a single line of JSON, the same fields as :meth:`_dump_dict`.
+        The fields are bytes straight from the dump, in whatever encoding it uses,
+        so they are read as Latin-1 (which any bytes are) rather than UTF-8.
+        """
+        
+        import json
+        
+        return json.dumps(self._dump_dict(), sort_keys=True, encoding="latin-1")
+    
+    def _dump_vcard(self):
+        """
+        Make a vcard (v3.0, RFC 2426) representation of this contact.
+        
+        We build the text ourselves rather than go through vObject, which is a
+        lot quicker and means we can do things properly: skype and twitter get
+        their own X- properties rather than being stuffed under EMAIL, and phone
+        numbers are typed.
+        
+        :return:
+            String serialisation of the vcard, lines end in CRLF.
+        """
+        
+        names = [self.firstname or "", self.othernames or "", self.lastname or ""]
+        
+        lines = [
+                 "BEGIN:VCARD",
+                 "VERSION:3.0",
+                 "N:%s;%s;%s;;" % tuple([_vcard_escape(name) for name in (names[2], names[0], names[1])]),
+                 "FN:%s" % _vcard_escape(" ".join([name for name in names if name])),
+                ]
+        
+        for value in self.email or []:
+            lines.append("EMAIL;TYPE=INTERNET:%s" % _vcard_escape(value))
+        
+        for number in self.phone or []:
+            lines.append("TEL;TYPE=%s:%s" % (VCARD_PHONE_TYPES.get(number.type, "VOICE"), _vcard_escape(number.number)))
+        
+        for value in self.url or []:
+            lines.append("URL:%s" % _vcard_escape(value))
+        
+        # We don't split addresses up, so the whole thing goes in the street.
+        for value in self.address or []:
+            lines.append("ADR;TYPE=WORK:;;%s;;;;" % _vcard_escape(value))
+        
+        if self.skype is not None:
+            lines.append("X-SKYPE:%s" % _vcard_escape(self.skype))
+        
+        if self.twitter is not None:
+            lines.append("X-TWITTER:%s" % _vcard_escape(self.twitter))
+        
+        lines.append("END:VCARD")
+        
+        return "".join([_vcard_fold(line) + "\r\n" for line in lines])
+
+def _vcard_escape(value):
+    """
+    Escape a text value for a vCard.
+    """
+    
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\r\n", "\\n").replace("\n", "\\n")
+
+def _vcard_fold(line):
+    """
+    Fold a long vCard line, continuation lines start with a space.  We take
+    care not to split a UTF-8 character in half.
+    """
+    
+    if len(line) <= VCARD_LINE_LIMIT:
+        return line
+    
+    parts = []
+    limit = VCARD_LINE_LIMIT
+    
+    while len(line) > limit:
+        cut = limit
+        while cut > 1 and 0x80 <= ord(line[cut]) < 0xc0:
+            cut -= 1
+        
+        parts.append(line[:cut])
+        line = line[cut:]
+        limit = VCARD_LINE_LIMIT - 1 # Allow for the leading space.
+    
+    parts.append(line)
+    
+    return "\r\n ".join(parts)
+
+class ContactWriter(object):
+    """
+    Writes contacts out to a file-like object.  Contacts are serialised as they
+    are written but only sent to the file a batch at a time, which saves a lot
+    of small writes on big runs.
+    """
+    
+    # What goes after each contact, by format.
+    SEPARATORS = {"dict": "\n", "vcard": "", "ndjson": "\n"}
+    
+    def __init__(self, output, format="dict", batch_size=WRITER_BATCH_SIZE):
+        """
+        Initialise the object.
+        
+        :param output:
+            A file-like object to write to.
+        :param format:
+            One of "dict", "vcard" or "ndjson", see :meth:`Contact.dump`.
+        :param batch_size:
+            How many contacts to hold on to between writes.
+        """
+        
+        if format not in self.SEPARATORS:
+            raise Exception("Other formats not yet supported, please only use vcard, dict or ndjson")
+        
+        self.format = format
+        self.batch_size = batch_size
+        self._output = output
+        self._separator = self.SEPARATORS[format]
+        self._batch = []
+    
+    def write(self, contact):
+        """
+        Write a single contact.
+        """
+        
+        self._batch.append("%s%s" % (contact.dump(self.format), self._separator))
+        
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+    
+    def write_all(self, contacts):
+        """
+        Write all of the given contacts, and flush.
+        """
+        
+        for contact in contacts:
+            self.write(contact)
+        
+        self.flush()
+    
+    def flush(self):
+        """
+        Send anything we are holding on to to the file.
+        """
+        
+        if self._batch:
+            self._output.write("".join(self._batch))
+            self._batch = []
+        
+        if hasattr(self._output, "flush"):
+            self._output.flush()
+
+class ContactsList(list):
+    """
+    Utility class for storing a list of contacts.
+    
+    To keep :meth:`search` quick the list keeps an index (a dictionary of lists
+    of contacts) for each entry in :data:`CONTACT_INDEXES`.  Contacts tell the
+    list when their attributes are set, so the indexes stay up to date.  List
+    attributes (emails, urls etc.) are indexed on their first item, which is
+    fine as long as we only ever append to them.  An empty list must be
+    replaced rather than appended to, as that changes its first item without
+    the list being told.
+    """
+    
+    def __init__(self, contacts=()):
+        """
+        Initialise the object.
+        
+        :param contacts:
+            An iterable of :class:`Contact` instances to start with.
+        """
+        
+        list.__init__(self)
+        
+        self._indexes = dict((index, {}) for index in CONTACT_INDEXES)
+        self._entries = {} # id(contact) -> (position, contact, index keys)
+        self._count = 0
+        self.stats = None # A :class:`Stats` to count searches in, if wanted.
+        
+        self.extend(contacts)
+    
+    def __reduce__(self):
+        
+        # Let the indexes be rebuilt when we're unpickled, rather than pickled with us.
+        return (self.__class__, (list(self),))
+    
+    def add(self, contact):
+        """
+        Add a new contact to the list.
+        
+        :param contact:
+            An instance of :class:`Contact`.
+        """
+        
+        self.append(contact)
+    
+    def append(self, contact):
+        
+        list.append(self, contact)
+        self._index(contact)
+    
+    def extend(self, contacts):
+        
+        for contact in contacts:
+            self.append(contact)
+    
+    def __iadd__(self, contacts):
+        
+        self.extend(contacts)
+        
+        return self
+    
+    # Anything else that changes the list (or its order) just rebuilds the indexes.
+    def insert(self, *args):
+        
+        list.insert(self, *args)
+        self._rebuild()
+    
+    def remove(self, *args):
+        
+        list.remove(self, *args)
+        self._rebuild()
+    
+    def pop(self, *args):
+        
+        contact = list.pop(self, *args)
+        self._rebuild()
+        
+        return contact
+    
+    def reverse(self):
+        
+        list.reverse(self)
+        self._rebuild()
+    
+    def sort(self, *args, **kwargs):
+        
+        list.sort(self, *args, **kwargs)
+        self._rebuild()
+    
+    def __setitem__(self, *args):
+        
+        list.__setitem__(self, *args)
+        self._rebuild()
+    
+    def __delitem__(self, *args):
+        
+        list.__delitem__(self, *args)
+        self._rebuild()
+    
+    def __setslice__(self, *args):
+        
+        list.__setslice__(self, *args)
+        self._rebuild()
+    
+    def __delslice__(self, *args):
+        
+        list.__delslice__(self, *args)
+        self._rebuild()
+    
+    def _index_key(self, index, values):
+        """
+        Work out the key for an index from some attribute values.
+        
+        :param index:
+            A tuple of attribute names, from :data:`CONTACT_INDEXES`.
+        :param values:
+            A callable returning the value for an attribute name, or
+            :data:`_MISSING`.
+        :returns:
+            A hashable key, or None if the values can't be indexed.
+        """
+        
+        key = []
+        
+        for attribute in index:
+            value = values(attribute)
+            
+            if value is _MISSING or value is None:
+                return None
+            
+            if isinstance(value, list):
+                value = (list, value[0] if value else _MISSING)
+            
+            key.append(value)
+        
+        # Single attribute indexes are keyed on the bare value, so they can double
+        # as a set of the known values (see :meth:`indexed`).
+        key = key[0] if len(key) == 1 else tuple(key)
+        
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        
+        return key
+    
+    def _contact_keys(self, contact):
+        """
+        :returns:
+            A dictionary of index -> key for the given contact.
+        """
+        
+        keys = {}
+        
+        for index in CONTACT_INDEXES:
+            key = self._index_key(index, lambda attribute: getattr(contact, attribute, _MISSING))
+            if key is not None:
+                keys[index] = key
+        
+        return keys
+    
+    def _index(self, contact):
+        """
+        Add a contact (just appended to the list) to the indexes.
+        """
+        
+        keys = self._contact_keys(contact)
+        
+        for index, key in keys.items():
+            self._indexes[index].setdefault(key, []).append(contact)
+        
+        self._entries[id(contact)] = (self._count, contact, keys)
+        self._count += 1
+        
+        owners = getattr(contact, "_owners", None)
+        if owners is not None and not [owner for owner in owners if owner is self]:
+            owners.append(self)
+    
+    def _reindex(self, contact):
+        """
+        Called by a contact when one of its attributes has changed, so we can
+        move it to the right place in the indexes.
+        """
+        
+        position, contact, old_keys = self._entries[id(contact)]
+        keys = self._contact_keys(contact)
+        
+        for index in CONTACT_INDEXES:
+            old_key, key = old_keys.get(index), keys.get(index)
+            if old_key == key:
+                continue
+            
+            buckets = self._indexes[index]
+            
+            if old_key is not None:
+                bucket = [other for other in buckets[old_key] if other is not contact]
+                if bucket:
+                    buckets[old_key] = bucket
+                else:
+                    del buckets[old_key]
+            
+            if key is not None:
+                # Keep the bucket in list order, so searches give the same order as a scan.
+                bucket = buckets.setdefault(key, [])
+                bucket.append(contact)
+                bucket.sort(key=lambda other: self._entries[id(other)][0])
+        
+        self._entries[id(contact)] = (position, contact, keys)
+    
+    def _rebuild(self):
+        """
+        Throw away and rebuild all of the indexes.
+        """
+        
+        for position, contact, keys in self._entries.values():
+            owners = getattr(contact, "_owners", None)
+            if owners is not None:
+                owners[:] = [owner for owner in owners if owner is not self]
+        
+        self._indexes = dict((index, {}) for index in CONTACT_INDEXES)
+        self._entries = {}
+        self._count = 0
+        
+        for contact in self:
+            self._index(contact)
+    
+    def indexed(self, *attributes):
+        """
+        Get hold of one of our indexes, for example ``indexed("firstname")``.
+        This is the live index, so it keeps up as contacts are added or changed,
+        but it mustn't be changed by the caller.
+        
+        :returns:
+            A dictionary of key -> list of contacts.  For a single attribute the
+            key is the attribute value, so ``name in indexed("firstname")`` tells
+            us if any contact has that first name.
+        """
+        
+        return self._indexes[attributes]
+    
+    def search(self, **kwargs):
+        """
+        Very basic search function to pull out matching
+        contacts.  Exact string matching only, arguments are AND together.
+        
+        Looks for each keyword argument as an attribute on every
+        contact.  If attribute is set (not None), and is exact match, bingo!
+        
+        If the arguments cover one of our indexes only the contacts in the
+        matching bucket are checked, otherwise we fall back to checking them all.
+        
+        :returns:
+            A list of contacts!
+        """
+        
+        candidates = self
+        
+        for index in CONTACT_INDEXES:
+            if not all([attribute in kwargs for attribute in index]):
+                continue
+            
+            key = self._index_key(index, kwargs.get)
+            if key is not None:
+                candidates = self._indexes[index].get(key, [])
+                break
+        
+        if self.stats is not None:
+            self.stats.add("search_calls")
+            self.stats.add("search_scanned", len(candidates))
+        
+        matches = []
+        
+        for contact in candidates:
+            if all([(getattr(contact, key, None) is not None and getattr(contact, key) == value) for key, value in kwargs.items()]):
+                matches.append(contact)
+        
+        return matches
+    
+    def search_first_email(self, email, **kwargs):
+        """
+        Like :meth:`search`, but for the contacts whose first email is the one
+        given, however many more they have.  That is how a contact is known
+        when its header turns up again (see :meth:`Extractor._find_name`), as
+        signatures add to the emails after it.
+        
+        :param email:
+            The first email.
+        :returns:
+            A list of contacts.
+        """
+        
+        candidates = self._indexes[("email",)].get((list, email), [])
+        
+        if self.stats is not None:
+            self.stats.add("search_calls")
+            self.stats.add("search_scanned", len(candidates))
+        
+        return [contact for contact in candidates if all([(getattr(contact, key, None) is not None and getattr(contact, key) == value) for key, value in kwargs.items()])]
+
+class ContactResolver(object):
+    """
+    Merges contacts that are really the same person, for example when they
+    have written from two email addresses, or with and without their middle
+    name.  Contacts are the same if they share an email, a phone number or a
+    skype or twitter handle (once these have been normalised, so case and
+    formatting don't matter), directly or through other contacts.
+    
+    Rather than comparing every pair of contacts, each normalised value is a
+    key and every contact is joined (in a union-find) with the first contact
+    seen with the same key, so the work grows in line with the number of
+    contacts.
+    """
+    
+    def __init__(self, fields=RESOLVE_FIELDS, country_code=DEFAULT_COUNTRY_CODE):
+        """
+        Initialise the object.
+        
+        :param fields:
+            The fields to merge on, any of those in :data:`RESOLVE_FIELDS`.
+        :param country_code:
+            The country code for phone numbers written without one.
+        """
+        
+        self.fields = fields
+        self.country_code = country_code
+        self._phone_keys = {}
+    
+    def phone_key(self, number):
+        """
+        Normalise a phone number to just its digits, with the country code in
+        front (so "+61 2 9894 6277", "+61 (0)2 9894 6277" and "(02) 9894-6277"
+        give the same key).
+        
+        :returns:
+            The key, or None if the number is too short to be trusted.
+        """
+        
+        if number in self._phone_keys:
+            return self._phone_keys[number]
+        
+        # A "(0)" after the country code is the trunk zero for calling from
+        # inside the country, "+61 (0)2 9894 6277", it isn't dialled from outside.
+        digits = NON_DIGIT_REGEX.sub("", number.replace("(0)", ""))
+        
+        if number.lstrip().startswith("+"):
+            pass
+        elif digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            digits = self.country_code + digits[1:]
+        
+        if len(digits) < PHONE_KEY_MIN_DIGITS:
+            digits = None
+        
+        # The same numbers turn up again and again, so remember them.
+        self._phone_keys[number] = digits
+        
+        return digits
+    
+    def keys(self, contact):
+        """
+        Generator yielding the keys for a contact, as (field, normalised value).
+        """
+        
+        for field in self.fields:
+            value = getattr(contact, field)
+            if not value:
+                continue
+            
+            if field == "email":
+                for email in value:
+                    yield field, email.strip().lower()
+            
+            elif field == "phone":
+                for number in value:
+                    key = self.phone_key(number.number)
+                    if key is not None:
+                        yield field, key
+            
+            else:
+                yield field, value.strip().lstrip("@").lower()
+    
+    def groups(self, contacts):
+        """
+        Work out which contacts are the same person.
+        
+        :param contacts:
+            A list of contacts.
+        :returns:
+            A list of groups, each a list of positions in ``contacts``.  Both
+            the groups and the positions in them are in list order.
+        """
+        
+        parent = range(len(contacts))
+        
+        def find(position):
+            # Halve the path as we go, so later finds are quicker.
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            
+            return position
+        
+        seen = {}
+        
+        for position, contact in enumerate(contacts):
+            for key in self.keys(contact):
+                other = seen.setdefault(key, position)
+                if other == position:
+                    continue
+                
+                # Always keep the earliest contact as the root.
+                root, other = find(position), find(other)
+                if root != other:
+                    parent[max(root, other)] = min(root, other)
+        
+        groups = {}
+        order = []
+        
+        for position in range(len(contacts)):
+            root = find(position)
+            if root not in groups:
+                groups[root] = []
+                order.append(root)
+            
+            groups[root].append(position)
+        
+        return [groups[root] for root in order]
+    
+    def resolve(self, contacts):
+        """
+        Merge the contacts in a :class:`ContactsList` that are the same person,
+        in place.  Each group is merged in to its first contact, the rest are
+        removed from the list.
+        
+        :returns:
+            The number of contacts removed.
+        """
+        
+        survivors = []
+        
+        for group in self.groups(contacts):
+            target = contacts[group[0]]
+            
+            if len(group) > 1:
+                self.merge(target, [contacts[position] for position in group[1:]])
+            
+            survivors.append(target)
+        
+        removed = len(contacts) - len(survivors)
+        
+        if removed:
+            contacts[:] = survivors
+        
+        return removed
+    
+    def merge(self, target, others):
+        """
+        Merge the details of other contacts in to one.  Names and handles the
+        target doesn't have are taken from the first of the others that does,
+        list fields (emails etc.) get anything they don't already have, going
+        by the normalised value.
+        """
+        
+        for field in ("firstname", "lastname", "othernames", "skype", "twitter"):
+            if getattr(target, field):
+                continue
+            
+            for other in others:
+                if getattr(other, field):
+                    setattr(target, field, getattr(other, field))
+                    break
+        
+        normalise = {
+            "email": lambda value: value.strip().lower(),
+            "phone": lambda number: self.phone_key(number.number) or number,
+            "url": lambda value: value,
+            "address": lambda value: value.lower(),
+        }
+        
+        for field in ("email", "phone", "url", "address"):
+            key = normalise[field]
+            current = getattr(target, field) or []
+            keys = set([key(value) for value in current])
+            added = []
+            
+            for other in others:
+                for value in getattr(other, field) or ():
+                    if key(value) not in keys:
+                        keys.add(key(value))
+                        added.append(value)
+            
+            # A new list rather than appending, so the target's lists are told.
+            if added:
+                setattr(target, field, current + added)
+
+class ContactStore(object):
+    """
+    Contacts kept on disk in an SQLite database, so they can be built up over
+    many runs (to far more than would fit in memory) and looked up quickly,
+    by us or anything else that can read SQLite.
+    
+    Each run still finds its contacts in a :class:`ContactsList`, then adds
+    them here in bulk with :meth:`add_all`.  A contact already in the store
+    (going by its names and first email, as :meth:`Extractor._find_name` does)
+    gets anything new added to it rather than a second copy being made.
+    
+    The database is in WAL mode, so readers aren't held up while a run is
+    writing to it.  Names, emails and phone numbers are indexed.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY,
+            firstname TEXT NOT NULL,
+            lastname TEXT NOT NULL,
+            othernames TEXT NOT NULL,
+            email TEXT NOT NULL, -- The first one, see emails for them all.
+            skype TEXT,
+            twitter TEXT,
+            UNIQUE (firstname, lastname, othernames, email)
+        );
+        CREATE INDEX IF NOT EXISTS contacts_lastname ON contacts (lastname);
+        CREATE TABLE IF NOT EXISTS emails (contact INTEGER NOT NULL, email TEXT NOT NULL, UNIQUE (contact, email));
+        CREATE INDEX IF NOT EXISTS emails_email ON emails (email);
+        CREATE TABLE IF NOT EXISTS phones (contact INTEGER NOT NULL, type TEXT NOT NULL, number TEXT NOT NULL, UNIQUE (contact, type, number));
+        CREATE INDEX IF NOT EXISTS phones_number ON phones (number);
+        CREATE TABLE IF NOT EXISTS urls (contact INTEGER NOT NULL, url TEXT NOT NULL, UNIQUE (contact, url));
+        CREATE TABLE IF NOT EXISTS addresses (contact INTEGER NOT NULL, address TEXT NOT NULL, UNIQUE (contact, address));
+    """
+    
+    # Finds a contact by its key, for adding to the other tables.
+    CONTACT_ID = "SELECT id FROM contacts WHERE firstname = ? AND lastname = ? AND othernames = ? AND email = ?"
+    
+    def __init__(self, filename):
+        """
+        Initialise the object.
+        
+        :param filename:
+            The name of the database, it is created if it doesn't exist.
+        """
+        
+        import sqlite3
+        
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.text_factory = str # Our strings are bytes, as read from the file.
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(self.SCHEMA)
+    
+    def close(self):
+        
+        self._db.close()
+    
+    def __len__(self):
+        
+        return self._db.execute("SELECT count(*) FROM contacts").fetchone()[0]
+    
+    def __iter__(self):
+        
+        # A row at a time, so the store needn't fit in memory.
+        for row in self._db.execute("SELECT id, firstname, lastname, othernames, skype, twitter FROM contacts ORDER BY id"):
+            yield self._contact(row)
+    
+    def _key(self, contact):
+        """
+        :returns:
+            The values that tell a contact apart from the others, see
+            :attr:`CONTACT_ID`.
+        """
+        
+        return (contact.firstname or "", contact.lastname or "", contact.othernames or "", (contact.email or [""])[0])
+    
+    def add_all(self, contacts):
+        """
+        Add contacts to the store, or anything new about them if they are
+        already there.  It all happens in the one transaction, each table
+        being written to with a single bulk statement.
+        
+        :param contacts:
+            A list of :class:`Contact` instances.
+        """
+        
+        keys = [self._key(contact) for contact in contacts]
+        
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO contacts (firstname, lastname, othernames, email) VALUES (?, ?, ?, ?)", keys)
+            
+            self._db.executemany("UPDATE contacts SET skype = coalesce(?, skype), twitter = coalesce(?, twitter) WHERE id = (%s)" % self.CONTACT_ID,
+                                 ((contact.skype, contact.twitter) + key for contact, key in zip(contacts, keys) if contact.skype or contact.twitter))
+            
+            self._db.executemany("INSERT OR IGNORE INTO emails (contact, email) SELECT id, ? FROM contacts WHERE id = (%s)" % self.CONTACT_ID,
+                                 ((email,) + key for contact, key in zip(contacts, keys) for email in contact.email or ()))
+            
+            self._db.executemany("INSERT OR IGNORE INTO phones (contact, type, number) SELECT id, ?, ? FROM contacts WHERE id = (%s)" % self.CONTACT_ID,
+                                 (tuple(number) + key for contact, key in zip(contacts, keys) for number in contact.phone or ()))
+            
+            self._db.executemany("INSERT OR IGNORE INTO urls (contact, url) SELECT id, ? FROM contacts WHERE id = (%s)" % self.CONTACT_ID,
+                                 ((url,) + key for contact, key in zip(contacts, keys) for url in contact.url or ()))
+            
+            self._db.executemany("INSERT OR IGNORE INTO addresses (contact, address) SELECT id, ? FROM contacts WHERE id = (%s)" % self.CONTACT_ID,
+                                 ((address,) + key for contact, key in zip(contacts, keys) for address in contact.address or ()))
+    
+    def search(self, **kwargs):
+        """
+        Find contacts in the store, the arguments are ANDed together like
+        :meth:`ContactsList.search`.  Names, skype and twitter must match
+        exactly.  For emails, phone numbers, urls and addresses a contact matches if it
+        has the one given (or all of them, for a list), so
+        ``search(email="rob@example.com")`` finds whoever has used that
+        address.  Phone numbers are matched on the number, not its type.
+        
+        Everything but skype, twitter, urls and addresses is indexed, so as long as one of
+        the others is given only the matching contacts are looked at.
+        
+        :returns:
+            A list of contacts.
+        """
+        
+        conditions, values = [], []
+        lists = {"email": "SELECT contact FROM emails WHERE email = ?", "phone": "SELECT contact FROM phones WHERE number = ?", "url": "SELECT contact FROM urls WHERE url = ?",
+                 "address": "SELECT contact FROM addresses WHERE address = ?"}
+        
+        for key, value in kwargs.items():
+            if key in lists:
+                for item in (value if isinstance(value, list) else [value]):
+                    conditions.append("id IN (%s)" % lists[key])
+                    values.append(item.number if isinstance(item, PhoneNumber) else item)
+            
+            elif key in ("firstname", "lastname", "othernames", "skype", "twitter"):
+                conditions.append("%s = ?" % key)
+                values.append(value)
+            
+            else:
+                raise Exception("Can't search contacts on %s." % key)
+        
+        query = "SELECT id, firstname, lastname, othernames, skype, twitter FROM contacts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        return [self._contact(row) for row in self._db.execute(query + " ORDER BY id", values).fetchall()]
+    
+    def _contact(self, row):
+        """
+        Make a :class:`Contact` from a row of the contacts table.
+        """
+        
+        id, firstname, lastname, othernames, skype, twitter = row
+        contact = Contact(firstname=firstname, lastname=lastname, othernames=othernames, skype=skype, twitter=twitter)
+        
+        # The lists are in the order things were added, and None if empty like a new contact.
+        contact.email = [email for email, in self._db.execute("SELECT email FROM emails WHERE contact = ? ORDER BY rowid", (id,))] or None
+        contact.phone = [PhoneNumber(*number) for number in self._db.execute("SELECT type, number FROM phones WHERE contact = ? ORDER BY rowid", (id,))] or None
+        contact.url = [url for url, in self._db.execute("SELECT url FROM urls WHERE contact = ? ORDER BY rowid", (id,))] or None
+        contact.address = [address for address, in self._db.execute("SELECT address FROM addresses WHERE contact = ? ORDER BY rowid", (id,))] or None
+        
+        return contact
+
+class LRUCache(object):
+    """
+    A dictionary holding at most ``size`` items.  When it's full, adding an
+    item drops whichever was least recently added or looked up.
+    
+    Items are kept in a circular doubly linked list (of [previous, next, key,
+    value] lists) in the order they were used, so everything is O(1).
+    """
+    
+    PREVIOUS, NEXT, KEY, VALUE = range(0, 4)
+    
+    def __init__(self, size):
+        """
+        Initialise the object.
+        
+        :param size:
+            The most items to hold.
+        """
+        
+        self.size = size
+        self.hits = self.misses = 0 # Lookups with :meth:`get` that did (and didn't) find the key.
+        self._links = {} # key -> link
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+    
+    def __len__(self):
+        
+        return len(self._links)
+    
+    def __contains__(self, key):
+        
+        # Doesn't count as a use.
+        return key in self._links
+    
+    def get(self, key, default=None):
+        """
+        Look up a key, marking it as the most recently used.
+        """
+        
+        link = self._links.get(key)
+        if link is None:
+            self.misses += 1
+            return default
+        
+        self.hits += 1
+        self._unlink(link)
+        self._append(link)
+        
+        return link[self.VALUE]
+    
+    def __setitem__(self, key, value):
+        
+        link = self._links.get(key)
+        
+        if link is not None:
+            link[self.VALUE] = value
+            self._unlink(link)
+        
+        else:
+            if len(self._links) >= self.size:
+                # Make room by dropping the oldest.
+                oldest = self._root[self.NEXT]
+                self._unlink(oldest)
+                del self._links[oldest[self.KEY]]
+            
+            link = [None, None, key, value]
+            self._links[key] = link
+        
+        self._append(link)
+    
+    def _unlink(self, link):
+        
+        previous, next = link[self.PREVIOUS], link[self.NEXT]
+        previous[self.NEXT] = next
+        next[self.PREVIOUS] = previous
+    
+    def _append(self, link):
+        """
+        Put a link at the newest end of the list.
+        """
+        
+        last = self._root[self.PREVIOUS]
+        link[self.PREVIOUS], link[self.NEXT] = last, self._root
+        last[self.NEXT] = self._root[self.PREVIOUS] = link
+
+class LineCounter(object):
+    """
+    Counts how often each line appears.  Exact, but has to remember every
+    distinct line so memory grows with the input.
+    """
+    
+    def __init__(self):
+        """
+        Initialise the object.
+        """
+        
+        self._counts = {}
+    
+    def add(self, line):
+        """
+        Count another occurence of the line.
+        """
+        
+        counts = self._counts
+        counts[line] = counts.get(line, 0) + 1
+    
+    def count(self, line):
+        """
+        :returns:
+            How many times the line has been seen.
+        """
+        
+        return self._counts.get(line, 0)
+    
+    def update(self, other):
+        """
+        Add the counts from another :class:`LineCounter` to this one.
+        """
+        
+        for line, count in other._counts.iteritems():
+            self._counts[line] = self._counts.get(line, 0) + count
+
+class CountMinSketch(object):
+    """
+    Approximately counts how often each line appears, in a fixed amount of
+    memory (``width * depth`` counters) however big the input is.
+    
+    Estimates are never under, but different lines can share counters so they
+    might be over by up to around ``e * total / width``.  With the default
+    width that is more than the usual threshold once the input runs to tens of
+    millions of lines, and past that almost every line looks frequent.  So the
+    sketch is only used to pick out the lines that might be frequent, and
+    :meth:`confirm` then counts just those exactly in a second pass.  Counts
+    are exact either way, but the narrower the sketch is for the input the
+    more lines have to be counted exactly.
+    """
+    
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        """
+        Initialise the object.
+        
+        :param width:
+            Number of counters in each row.
+        :param depth:
+            Number of rows, each with its own hash of the line.
+        """
+        
+        self.width = width
+        self.depth = depth
+        self._rows = [array.array("I", [0]) * width for row in range(depth)]
+        self._exact = None
+    
+    def _positions(self, line):
+        """
+        Work out the counter to use in each row.  We hash the line once and
+        combine the two halves of the hash to get a different one for each row.
+        """
+        
+        value = hash(line)
+        low, high = value & 0xffffffff, ((value >> 32) & 0xffffffff) | 1
+        
+        return [(low + row * high) % self.width for row in range(self.depth)]
+    
+    def add(self, line):
+        """
+        Count another occurence of the line.
+        """
+        
+        for row, position in zip(self._rows, self._positions(line)):
+            row[position] += 1
+    
+    def estimate(self, line):
+        """
+        :returns:
+            The (over) estimate of how many times the line has been seen.
+        """
+        
+        return min([row[position] for row, position in zip(self._rows, self._positions(line))])
+    
+    def confirm(self, lines, threshold=HIGH_FREQUENCY_THRESHOLD):
+        """
+        Count exactly the lines estimated to appear at least ``threshold``
+        times, once everything has been added.  When resuming, this carries on
+        from the counts confirmed last time, so a line that only becomes
+        frequent later is counted from there.
+        
+        :param lines:
+            An iterable over the same lines that were added.
+        :param threshold:
+            How many times a line has to appear to be counted.
+        """
+        
+        if self._exact is None:
+            self._exact = {}
+        
+        exact = self._exact
+        
+        for line in lines:
+            if line in exact:
+                exact[line] += 1
+            
+            elif self.estimate(line) >= threshold:
+                exact[line] = 1
+    
+    def count(self, line):
+        """
+        :returns:
+            How many times the line has been seen, exactly if it is frequent and
+            :meth:`confirm` has been called, otherwise the estimate.
+        """
+        
+        if self._exact is None:
+            return self.estimate(line)
+        
+        return self._exact.get(line, 0)
+    
+    def update(self, other):
+        """
+        Add the counts from another :class:`CountMinSketch`, of the same size, to
+        this one.
+        """
+        
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise Exception("Can only combine sketches of the same size.")
+        
+        for row, other_row in zip(self._rows, other._rows):
+            for position, count in enumerate(other_row):
+                if count:
+                    row[position] += count
+        
+        if other._exact is not None:
+            if self._exact is None:
+                self._exact = {}
+            
+            for line, count in other._exact.iteritems():
+                self._exact[line] = self._exact.get(line, 0) + count
+
+class SignatureGate(object):
+    """
+    A cheap check for whether a line could be the start of a signature, used by
+    :meth:`Extractor._find_signatures` before it does anything more expensive.
+    
+    A signature starts with a short line beginning with a name we know.  That
+    is one bounded split and one dictionary lookup per line, lines that fail go
+    straight through.  We also keep count of how many lines were gated and how
+    many were passed on to be examined, which helps when tuning things.
+    """
+    
+    def __init__(self, signoffs=POSSIBLE_SIGNOFFS):
+        """
+        Initialise the object.
+        
+        :param signoffs:
+            The signoff strings (lower case) to look out for.
+        """
+        
+        self.names = {} # Anything supporting 'in', normally :meth:`ContactsList.indexed`.
+        self.signoffs = frozenset(signoffs)
+        self.gated = 0 # Lines that couldn't start a signature.
+        self.examined = 0 # Lines that could.
+        self.signoffs_seen = 0 # Gated lines that were signoffs.
+    
+    def check(self, line):
+        """
+        Check if the line could start a signature.
+        
+        :param line:
+            A (non blank) line from the file.
+        :returns:
+            The words on the line if it could, otherwise None.
+        """
+        
+        # We never need more than the first few words, so don't split the rest.
+        tokens = line.split(None, SIGNOFF_LINE_LENGTH_LIMIT)
+        
+        if len(tokens) > SIGNOFF_LINE_LENGTH_LIMIT:
+            self.gated += 1
+            return None
+        
+        if tokens[0] not in self.names:
+            # Not a name, perhaps it's a signoff string?  Multi word ones included, we
+            # normalise the whole line so it's just the one lookup.
+            if " ".join(tokens).lower().rstrip(",.!") in self.signoffs:
+                self.signoffs_seen += 1
+            
+            self.gated += 1
+            return None
+        
+        self.examined += 1
+        
+        return tokens
+    
+    def counts(self):
+        """
+        :returns:
+            A dictionary of the counters.
+        """
+        
+        return {"gated": self.gated, "examined": self.examined, "signoffs": self.signoffs_seen}
+    
+    def update(self, counts):
+        """
+        Add counters from :meth:`counts` (of another gate) to ours.
+        """
+        
+        self.gated += counts["gated"]
+        self.examined += counts["examined"]
+        self.signoffs_seen += counts["signoffs"]
+
+class SignatureScorer(object):
+    """
+    Decides whether what :meth:`Extractor._find_signatures` took to be a
+    signature really is one, before anything found in it is added to the
+    contact.  Otherwise any short line starting with a name we know is taken
+    at its word, and whatever follows it is added to that contact.
+    
+    Each signature is scored as it goes past, on the lines just before it (a
+    signoff is a good sign), its first line (the contact's name and nothing
+    else) and the rest (each kind of field found adds to it, lines that read
+    like sentences take away), see :data:`SIGNATURE_SCORE_WEIGHTS`.  Only those
+    scoring at least the threshold are kept.
+    
+    All we hold on to is a ring buffer of the last few lines before a
+    signature and the fields found in the one we are in, so memory stays fixed
+    however big the input.  The scores given are counted, to help with tuning
+    the threshold and weights against a dump (try ``--stats``).
+    """
+    
+    def __init__(self, threshold=SIGNATURE_SCORE_THRESHOLD, weights=None, window=SIGNOFF_WINDOW, signoffs=POSSIBLE_SIGNOFFS):
+        """
+        Initialise the object.
+        
+        :param threshold:
+            What a signature must score to be kept.
+        :param weights:
+            Any weights to change from :data:`SIGNATURE_SCORE_WEIGHTS`.
+        :param window:
+            How many lines before a signature to look at for a signoff.
+        :param signoffs:
+            The signoff strings (lower case) to look out for.
+        """
+        
+        self.threshold = threshold
+        self.weights = dict(SIGNATURE_SCORE_WEIGHTS)
+        self.weights.update(weights or {})
+        self.window = window
+        self.signoffs = frozenset(signoffs)
+        self.recent = collections.deque(maxlen=window + 1) # The lines outside of signatures, the last being a signature's first.
+        self.contact = None # Whose signature we are in, if we are.
+        self.score = 0 # What it has scored so far.
+        self.fields = [] # The fields found on each of its lines, see :meth:`Extractor._scan_line`.
+        self.accepted = 0 # Signatures kept.
+        self.rejected = 0 # And those that weren't.
+        self.scores = {} # Score -> how many signatures got it.
+    
+    def settings(self):
+        """
+        :returns:
+            The arguments to make another scorer like this one (without its
+            counts), such as in a worker process.
+        """
+        
+        return self.threshold, self.weights, self.window, sorted(self.signoffs)
+    
+    def start(self, contact, tokens):
+        """
+        A signature has started.
+        
+        :param contact:
+            Whose signature it is.
+        :param tokens:
+            The words on its first line (the last line added to :attr:`recent`).
+        """
+        
+        self.contact = contact
+        self.fields = []
+        self.score = 0
+        
+        for line in list(self.recent)[:-1]:
+            if self.is_signoff(line.split()):
+                self.score += self.weights["signoff"]
+                break
+        
+        name = [part for part in (contact.firstname, contact.othernames, contact.lastname) if part]
+        if " ".join(tokens).rstrip(",.") == " ".join(name):
+            self.score += self.weights["name"]
+    
+    def is_signoff(self, tokens):
+        """
+        :param tokens:
+            The words on a line.
+        :returns:
+            Whether the line is a signoff, like :class:`SignatureGate` checks.
+        """
+        
+        return len(tokens) <= SIGNOFF_LINE_LENGTH_LIMIT and " ".join(tokens).lower().rstrip(",.!") in self.signoffs
+    
+    def add(self, tokens, fields):
+        """
+        Another line of the signature.
+        
+        :param tokens:
+            The words on the line.
+        :param fields:
+            What was found on it, as from :meth:`Extractor._scan_line`.
+        """
+        
+        self.fields.append(fields)
+        
+        # A few words ending in a full stop (and nothing else) is more likely someone
+        # carrying on with their message than a job title or address.
+        if len(tokens) > SIGNOFF_LINE_LENGTH_LIMIT and tokens[-1][-1] in ".?!" and not any(fields):
+            self.score += self.weights["prose"]
+    
+    def finish(self):
+        """
+        The signature has ended, score it.
+        
+        :returns:
+            A tuple of the contact and the fields found on each line, or of
+            None and an empty list if it didn't score well enough (or there
+            wasn't one).
+        """
+        
+        contact, fields = self.contact, self.fields
+        self.contact, self.fields = None, []
+        
+        if contact is None:
+            return None, []
+        
+        # Each kind of field counts once, however many lines it is on.
+        score = self.score + self.weights["field"] * len([kind for kind in zip(*fields) if any(kind)])
+        self.scores[score] = self.scores.get(score, 0) + 1
+        
+        if score < self.threshold:
+            self.rejected += 1
+            return None, []
+        
+        self.accepted += 1
+        
+        return contact, fields
+    
+    def counts(self):
+        """
+        :returns:
+            A dictionary of the counters.
+        """
+        
+        return {"accepted": self.accepted, "rejected": self.rejected, "scores": dict(self.scores)}
+    
+    def update(self, counts):
+        """
+        Add counters from :meth:`counts` (of another scorer) to ours.
+        """
+        
+        self.accepted += counts["accepted"]
+        self.rejected += counts["rejected"]
+        
+        for score, count in counts["scores"].items():
+            self.scores[score] = self.scores.get(score, 0) + count
+
+class Gazetteer(object):
+    """
+    The Australian states, postcodes and street types, for spotting postal
+    addresses (see :meth:`find_address`).  They are read from :data:`GAZETTEER`
+    (or a file in the same format) in to dictionaries, so checking a word is a
+    single lookup and a line is looked at in one go.  This is only done the
+    first time a gazetteer is needed.
+    
+    A line is only looked at closely if it has a state in it, which is one
+    regular expression (built from the states we know) over lines that have a
+    digit in them anyway.
+    """
+    
+    _loaded = {} # Filename (or None) -> gazetteer, so each is only read the once.
+    
+    def __init__(self, filename=None):
+        """
+        Initialise the object.
+        
+        :param filename:
+            A gazetteer file, in the same format as :data:`GAZETTEER`.  By
+            default we use that.
+        """
+        
+        self.states = {} # Abbreviation or name -> abbreviation.
+        self.postcodes = {} # Postcode -> state abbreviation.
+        self.streets = {} # Street type or abbreviation (lower case) -> street type.
+        
+        if filename is None:
+            lines = GAZETTEER.splitlines()
+        
+        else:
+            with open(filename) as fd:
+                lines = fd.readlines()
+        
+        for line in lines:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            
+            if fields[0] == "state":
+                self.states[fields[1]] = self.states[" ".join(fields[2:])] = fields[1]
+            
+            elif fields[0] == "postcode":
+                for postcode in xrange(int(fields[1]), int(fields[2]) + 1):
+                    self.postcodes["%04d" % postcode] = fields[3]
+            
+            elif fields[0] == "street":
+                for name in fields[1:]:
+                    self.streets[name.lower()] = fields[1]
+            
+            else:
+                raise Exception("Unknown gazetteer entry: %s" % line.strip())
+        
+        # Longest first, so a name isn't cut short by an abbreviation.
+        states = "|".join([re.escape(state) for state in sorted(self.states, key=len, reverse=True)])
+        self.locality = re.compile("\\b(?P<state>%s)\\b\\.?,?(\\s+(?P<postcode>[0-9]{4})\\b)?" % states)
+    
+    @classmethod
+    def load(cls, filename=None):
+        """
+        :returns:
+            The gazetteer for the file (or :data:`GAZETTEER`), only reading it
+            the first time.
+        """
+        
+        if filename not in cls._loaded:
+            cls._loaded[filename] = cls(filename)
+        
+        return cls._loaded[filename]
+    
+    def find_address(self, line):
+        """
+        Look for an address on a line, which is taken to be an optional street
+        (a number, name and street type, or a PO box) followed by a suburb,
+        state and postcode:
+        
+            Level 5, 123 George Street, Sydney NSW 2000
+            Surry Hills NSW 2010
+        
+        The postcode must be one of the state's.  Without a postcode we need a
+        street to go on.
+        
+        :returns:
+            A tuple of the street (or None) and the suburb, state and postcode
+            (tidied up, "Sydney NSW 2000"), or None if there's no address.
+        """
+        
+        for match in self.locality.finditer(line):
+            state = self.states[match.group("state")]
+            postcode = match.group("postcode")
+            
+            if postcode is not None and self.postcodes.get(postcode) != state:
+                continue
+            
+            before = line[:match.start()]
+            street = self._find_street(before)
+            
+            # The suburb is the words just before the state, back to the street (if any)
+            # and not past anything but spaces and commas.
+            words = [word for word in ADDRESS_WORD_REGEX.finditer(before) if street is None or word.start() >= street[1]]
+            suburb = []
+            
+            for word in reversed(words[-ADDRESS_SUBURB_WORDS:]):
+                if not word.group()[0].isupper() or before[word.end():(suburb[0].start() if suburb else len(before))].strip(" ,"):
+                    break
+                
+                suburb.insert(0, word)
+            
+            if street is None and (not suburb or postcode is None):
+                continue
+            
+            locality = " ".join([word.group() for word in suburb] + [state] + ([postcode] if postcode else []))
+            
+            return (None if street is None else " ".join(before[street[0]:street[1]].split())), locality
+        
+        return None
+    
+    def find_street(self, line):
+        """
+        :returns:
+            The street (number, name and street type, or PO box) on the line, or
+            None if there isn't one.
+        """
+        
+        street = self._find_street(line)
+        
+        if street is None:
+            return None
+        
+        return " ".join(line[street[0]:street[1]].split())
+    
+    def _find_street(self, text):
+        """
+        :returns:
+            The start and end of the first street in the text, or None.
+        """
+        
+        match = PO_BOX_REGEX.search(text)
+        if match:
+            return match.span()
+        
+        words = list(ADDRESS_WORD_REGEX.finditer(text))
+        
+        for position, number in enumerate(words):
+            if not STREET_NUMBER_REGEX.match(number.group()):
+                continue
+            
+            # A name (of words, not numbers) then the street type.
+            for end in range(position + 1, min(position + 2 + ADDRESS_STREET_WORDS, len(words))):
+                word = words[end].group()
+                if not word[0].isalpha():
+                    break
+                
+                if end > position + 1 and word.rstrip(".").lower() in self.streets:
+                    start = number.start()
+                    
+                    # Take in a "Level 5" (or suite etc.) before the number.
+                    if position >= 2 and words[position - 2].group().lower() in ADDRESS_UNITS and words[position - 1].group().isdigit():
+                        start = words[position - 2].start()
+                    
+                    return start, words[end].end()
+        
+        return None
+
+class MappedFile(object):
+    """
+    A file on disk that is memory mapped rather than read, see
+    :meth:`Extractor.load`.
+    
+    Iterating over it gives the lines of the file, but it can also skip thread
+    and blank lines by looking at the mapped bytes directly, so those lines are
+    never copied out of the file at all.  Only lines that make it through become
+    strings, and the pages of the file are left to the OS to manage.
+    """
+    
+    def __init__(self, filename):
+        """
+        Initialise the object.
+        
+        :param filename:
+            The name of the file on disk to map.
+        """
+        
+        self.filename = filename
+        self.skipped = (0, 0) # Thread and blank lines skipped by the last full read.
+        self.masked = 0 # Lines left out by the last :meth:`candidate_lines`.
+    
+    def __iter__(self):
+        
+        return self.lines()
+    
+    def lines(self, start=0, end=None, ignore_threads=False, skip_blank=False):
+        """
+        Generator yielding lines from the file.
+        
+        :param start:
+            Byte offset to start from, which should be the start of a line.
+        :param end:
+            Byte offset to stop at, by default the end of the file.
+        :param ignore_threads:
+            If set, skip thread lines (those starting with a '>' character).
+        :param skip_blank:
+            If set, skip lines that are only whitespace.
+        """
+        
+        import mmap
+        
+        self.skipped, self.masked = (0, 0), 0
+        
+        with open(self.filename, "rb") as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if not size:
+                # Can't map an empty file.
+                return
+            
+            mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        threads = blank = 0
+        
+        try:
+            find, non_blank = mapped.find, NON_BLANK_REGEX.search
+            position, end = start, size if end is None else min(end, size)
+            
+            while position < end:
+                stop = find("\n", position, end)
+                stop = end if stop == -1 else stop + 1
+                
+                if ignore_threads and find(THREAD_IDENTIFIER, position, position + len(THREAD_IDENTIFIER)) == position:
+                    threads += 1
+                
+                elif skip_blank and non_blank(mapped, position, stop) is None:
+                    blank += 1
+                
+                else:
+                    yield mapped[position:stop]
+                
+                position = stop
+            
+            self.skipped = (threads, blank)
+        
+        finally:
+            mapped.close()
+    
+    def candidate_lines(self, start=0, end=None, ignore_threads=False, names=None, window=SIGNATURE_LINE_COUNT_LIMIT + 1):
+        """
+        Like :meth:`lines` (skipping blank lines), but only giving the lines
+        :meth:`Extractor._find_signatures` might do something with.
+        
+        A signature only starts on a line of no more than
+        :data:`SIGNOFF_LINE_LENGTH_LIMIT` words beginning with a name we know
+        (see :class:`SignatureGate`), and can't go on for more than ``window``
+        lines.  So any line more than ``window`` lines after the last that could
+        start one can be left out, and that is most of them.
+        
+        Working that out a line at a time in Python is what we're trying to
+        avoid, so it's done with NumPy over the mapped bytes a chunk at a time:
+        find the line breaks, then the words on each line.  Only the short
+        lines (to check their first word) and the lines we keep are turned in
+        to strings.
+        
+        Note that NumPy is only imported when this is called, and if it isn't
+        installed this raises ImportError straight away.
+        
+        :param names:
+            The first names a signature could start with, or None to allow any
+            short line.
+        :returns:
+            A generator over the lines.
+        """
+        
+        import numpy
+        
+        return self._candidate_lines(numpy, start, end, ignore_threads, names, window)
+    
+    def _candidate_lines(self, numpy, start, end, ignore_threads, names, window):
+        
+        import mmap
+        
+        self.skipped, self.masked = (0, 0), 0
+        
+        with open(self.filename, "rb") as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if not size:
+                return
+            
+            mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        # The same whitespace str.split() and str.strip() go by.
+        whitespace = numpy.zeros(256, dtype=bool)
+        whitespace[[ord(character) for character in " \t\n\r\x0b\x0c"]] = True
+        
+        threads = blank = masked = 0
+        
+        # Lines at the start of the next chunk still within the window.  We might be
+        # starting part way through a signature, so the first few are always kept.
+        following = window
+        data = chunk = None
+        
+        try:
+            data = numpy.frombuffer(mapped, dtype=numpy.uint8)
+            position, end = start, size if end is None else min(end, size)
+            
+            while position < end:
+                # Each chunk ends on a line break (or the end).
+                stop = mapped.find("\n", min(position + CANDIDATE_CHUNK_SIZE, end) - 1, end)
+                stop = end if stop == -1 else stop + 1
+                chunk = data[position:stop]
+                
+                breaks = numpy.flatnonzero(chunk == ord("\n")) + 1
+                if not len(breaks) or breaks[-1] != len(chunk):
+                    breaks = numpy.append(breaks, len(chunk))
+                
+                starts = numpy.concatenate(([0], breaks[:-1]))
+                
+                # A word starts on any non-whitespace after whitespace, or the start of the chunk.
+                spaces = whitespace[chunk]
+                words = ~spaces
+                words[1:] &= spaces[:-1]
+                counts = numpy.add.reduceat(words, starts, dtype=numpy.int32)
+                
+                thread = chunk[starts] == ord(THREAD_IDENTIFIER) if ignore_threads else numpy.zeros(len(starts), dtype=bool)
+                empty = (counts == 0) & ~thread
+                kept = numpy.flatnonzero(~thread & ~empty)
+                
+                threads += int(thread.sum())
+                blank += int(empty.sum())
+                
+                # Which of the short lines start with a name.
+                short = counts[kept] <= SIGNOFF_LINE_LENGTH_LIMIT
+                
+                if names is not None and short.any():
+                    lines = kept[short]
+                    short[short] = [mapped[first:last].split(None, 1)[0] in names for first, last in zip((starts[lines] + position).tolist(), (breaks[lines] + position).tolist())]
+                
+                # Keep a line if one of those is from ``window`` lines back to here, by
+                # counting them so far.
+                total = numpy.cumsum(short, dtype=numpy.int32)
+                behind = numpy.concatenate((numpy.zeros(window + 1, dtype=numpy.int32), total))[:len(total)]
+                wanted = total > behind
+                wanted[:following] = True
+                
+                shorts = numpy.flatnonzero(short)
+                last = shorts[-1] + window - (len(kept) - 1) if len(shorts) else 0
+                following = max(last, following - len(kept), 0)
+                
+                masked += len(kept) - int(wanted.sum())
+                
+                lines = kept[wanted]
+                
+                for first, last in zip((starts[lines] + position).tolist(), (breaks[lines] + position).tolist()):
+                    yield mapped[first:last]
+                
+                position = stop
+            
+            self.skipped, self.masked = (threads, blank), masked
+        
+        finally:
+            # The arrays looking at the map have to go before it can be closed.
+            data = chunk = None
+            mapped.close()
+
+class MessageIndex(object):
+    """
+    Where each message in a dump starts, so a message (or everything after it)
+    can be read without going through the rest of the dump.  See
+    :meth:`Extractor.index_messages`, which builds these.
+    
+    The dump has no headers of its own, so a message is taken to end with its
+    "wrote:" line (plus the thread and blank lines after it).  That line always
+    leaves :meth:`Extractor._find_signatures` outside of a signature (see
+    :meth:`Extractor._is_reset_line`), so no signature runs from one message
+    in to the next.  Signoffs and blank lines don't do that, so don't end a
+    message.  A message parsed on its own still only knows the names found in
+    it though, so a signature whose name only appears elsewhere in the dump is
+    missed.
+    
+    The offsets are kept in an array rather than a list, as there can be a lot
+    of them.  Indexing gives the (start, end) byte range of a message.
+    """
+    
+    def __init__(self, ignore_threads=True):
+        """
+        Initialise the object.
+        
+        :param ignore_threads:
+            Whether thread lines are ignored when parsing, as they only belong to
+            the message before them if so.
+        """
+        
+        self.ignore_threads = ignore_threads
+        self.offsets = array.array("L", [0])
+        self.size = 0 # How much of the file has been indexed.
+        self.pending = False # Set if the last line indexed ended a message, but the next hasn't started.
+        self.fingerprint = None # Of the content just before :attr:`size`, see :meth:`Extractor._fingerprint`.
+    
+    def __len__(self):
+        
+        return len(self.offsets)
+    
+    def __getitem__(self, number):
+        
+        if number < 0:
+            number += len(self.offsets)
+        
+        if not 0 <= number < len(self.offsets):
+            raise IndexError("No message %d, there are %d." % (number, len(self.offsets)))
+        
+        end = self.offsets[number + 1] if number + 1 < len(self.offsets) else self.size
+        
+        return self.offsets[number], end
+    
+    def find(self, offset):
+        """
+        :returns:
+            The number of the message the given byte offset is in.
+        """
+        
+        import bisect
+        
+        return bisect.bisect_right(self.offsets, offset) - 1
+    
+    def next_start(self, offset):
+        """
+        :returns:
+            The offset of the first message starting at or after the given byte
+            offset, or None if that's past the end of the index.
+        """
+        
+        import bisect
+        
+        number = bisect.bisect_left(self.offsets, offset)
+        
+        return self.offsets[number] if number < len(self.offsets) else None
+    
+    @classmethod
+    def load(cls, filename):
+        """
+        Load an index saved by :meth:`save`.
+        
+        :returns:
+            A :class:`MessageIndex`, or None if there isn't one (or it's from an
+            older version).
+        """
+        
+        import cPickle
+        
+        if not os.path.exists(filename):
+            return None
+        
+        with open(filename, "rb") as fd:
+            saved = cPickle.load(fd)
+        
+        if saved["version"] != INDEX_VERSION:
+            return None
+        
+        index = cls(saved["ignore_threads"])
+        index.offsets = array.array("L")
+        index.offsets.fromstring(saved["offsets"])
+        index.size, index.pending, index.fingerprint = saved["size"], saved["pending"], saved["fingerprint"]
+        
+        return index
+    
+    def save(self, filename):
+        """
+        Save the index.  The file is replaced in one go so an interrupted save
+        leaves the old one intact.
+        """
+        
+        import cPickle
+        
+        saved = {
+            "version": INDEX_VERSION,
+            "ignore_threads": self.ignore_threads,
+            "offsets": self.offsets.tostring(),
+            "size": self.size,
+            "pending": self.pending,
+            "fingerprint": self.fingerprint,
+        }
+        
+        temporary = "%s.tmp" % filename
+        with open(temporary, "wb") as fd:
+            cPickle.dump(saved, fd, cPickle.HIGHEST_PROTOCOL)
+        
+        os.rename(temporary, filename)
+
+class Stats(object):
+    """
+    Timings and counters for an :class:`Extractor`, to help find where the time
+    goes.  They are only kept if asked for (see :attr:`Extractor.stats`), and
+    are counted in bulk at the end of each pass where we can, so keeping them
+    costs very little.
+    """
+    
+    def __init__(self):
+        """
+        Initialise the object.
+        """
+        
+        self.timings = {} # Seconds spent in each stage.
+        self.counters = {}
+    
+    def time(self, stage, seconds):
+        """
+        Add time spent in a stage.
+        """
+        
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+    
+    def add(self, counter, count=1):
+        """
+        Add to a counter.
+        """
+        
+        self.counters[counter] = self.counters.get(counter, 0) + count
+    
+    def update(self, other):
+        """
+        Add the timings and counters from :meth:`as_dict` (of other stats) to ours.
+        """
+        
+        for stage, seconds in other["timings"].items():
+            self.time(stage, seconds)
+        
+        for counter, count in other["counters"].items():
+            self.add(counter, count)
+    
+    def as_dict(self):
+        """
+        :returns:
+            A dictionary of the timings, counters and averages worked out from
+            the counters.
+        """
+        
+        averages = {}
+        
+        if self.counters.get("search_calls"):
+            averages["search_scan_length"] = float(self.counters["search_scanned"]) / self.counters["search_calls"]
+        
+        return {"timings": dict(self.timings), "counters": dict(self.counters), "averages": averages}
+    
+    def as_json(self):
+        """
+        :returns:
+            :meth:`as_dict` as a JSON string.
+        """
+        
+        import json
+        
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+class Extractor(object):
+    """
+    Class for extacting email signatures from a dump of emails.
+    """
+    
+    def __init__(self, stats=False, scan_cache_size=SCAN_CACHE_SIZE):
+        """
+        Initialise the object.
+        
+        :param stats:
+            If set, keep timings and counters for everything we do in
+            :attr:`stats`.  See :class:`Stats`.
+        :param scan_cache_size:
+            How many signature lines to remember the fields of, as the same
+            lines turn up in signature after signature.  Zero to not bother.
+        """
+        
+        self.stats = Stats() if stats else None
+        self._scanned = LRUCache(scan_cache_size) if scan_cache_size else None # Line -> fields, see :meth:`_find_signatures`.
+        self._lines = [] # Define variable for holding the file contents.
+        self._source = None # Or, when streaming, where the contents come from.
+        self._contacts = ContactsList() # Define variable for holding the contacts that we find.
+        self._start, self._end = 0, None # The byte range of a file to read, see :meth:`parse`.
+        self._found = None # Or a list, to collect the contacts named, see :meth:`extract_message`.
+        self._remove_blocks = False # Whether to drop repeated blocks of lines, see :meth:`parse`.
+        self.vectorise = True # Use NumPy (if installed) to skip lines in a mapped file, see :meth:`MappedFile.candidate_lines`.
+        self.gate = SignatureGate() # Decides which lines are worth a closer look.
+        self.scorer = None # Or a :class:`SignatureScorer`, to only keep signatures that score well enough.
+        self.gazetteer = None # For finding addresses, the built in :class:`Gazetteer` is loaded if need be.
+    
+    def load(self, source, stream=False, mapped=False, start=0, end=None):
+        """
+        Load the content we wish to extract signatures from.  The source can be the
+        name of a file on disk (for example data/emails.txt), an open file object or
+        any other iterable of lines.
+        
+        By default the entire content is read in one go and kept in memory.  For
+        large dumps pass ``stream=True`` instead; we then only hold on to the source
+        and pull lines through the :meth:`parse` stages one at a time, so memory use
+        stays flat however big the dump is.
+        
+        :param source:
+            A filename, file object or iterable of lines.
+        :param stream:
+            By default the content is read in to memory.  If set, the content is
+            read lazily when :meth:`parse` is called.
+        :param mapped:
+            If set, the source must be a filename, and it is streamed from a memory
+            map of the file.  See :class:`MappedFile`.
+        :param start:
+            Byte offset to start reading a file from, which should be the start
+            of a line.  For example the start of a message, see
+            :meth:`index_messages`.
+        :param end:
+            Byte offset to stop reading a file at, by default its end.
+        """
+        
+        if (start or end is not None) and not ((stream or mapped) and isinstance(source, basestring)):
+            raise Exception("Only part of a file can be read if it is streamed (or mapped) from a filename.")
+        
+        self._lines = []
+        self._source = None
+        self._start, self._end = start, end
+        
+        if mapped:
+            self._source = MappedFile(source)
+            self._offset = None
+        
+        elif stream:
+            self._source = source
+            self._offset = source.tell() if self._is_seekable(source) else None
+        
+        else:
+            with self._stage("load"):
+                if isinstance(source, basestring):
+                    with open(source) as fd:
+                        self._lines = fd.readlines()
+                
+                else:
+                    self._lines = list(source)
+    
+    def _is_seekable(self, source):
+        """
+        Check if the given file-like object can be rewound.  Pipes (such as stdin)
+        have a seek method but blow up when you use it.
+        """
+        
+        if not hasattr(source, "seek"):
+            return False
+        
+        try:
+            source.seek(0, 1)
+        except (IOError, OSError):
+            return False
+        
+        return True
+    
+    def _is_rewindable(self):
+        """
+        Can the loaded content be read more than once?  Filenames, seekable files
+        and containers such as lists can; generators and pipes cannot.
+        """
+        
+        source = self._source
+        
+        if source is None or isinstance(source, basestring):
+            return True
+        
+        if hasattr(source, "seek"):
+            return self._offset is not None
+        
+        return iter(source) is not source
+    
+    def _read_lines(self):
+        """
+        Return an iterator over the raw lines of the loaded content, starting from
+        the beginning each time it is called (if the source allows it).
+        """
+        
+        if self._source is None:
+            return iter(self._lines)
+        
+        if isinstance(self._source, basestring):
+            return self._read_file(self._source, self._start, self._end)
+        
+        if isinstance(self._source, MappedFile):
+            return self._source.lines(self._start, self._end)
+        
+        if self._offset is not None:
+            self._source.seek(self._offset)
+        
+        return iter(self._source)
+    
+    def _source_filename(self):
+        """
+        :returns:
+            The name of the file the content is streamed from, if it is.
+        """
+        
+        if isinstance(self._source, basestring):
+            return self._source
+        
+        if isinstance(self._source, MappedFile):
+            return self._source.filename
+        
+        return None
+    
+    def _read_file(self, filename, start=0, end=None):
+        """
+        Generator yielding the lines of a file on disk.
+        
+        :param start:
+            Byte offset to start from, which should be the start of a line.
+        :param end:
+            Byte offset to stop at (the end of a line), by default the end of the
+            file.
+        """
+        
+        with open(filename, "rb") as fd:
+            if start:
+                fd.seek(start)
+            
+            for line in fd:
+                if end is not None:
+                    start += len(line)
+                    if start > end:
+                        break
+                
+                yield line
+    
+    def _remove_thread_lines(self, lines):
+        """
+        Remove thread lines from the input.  A thread is deemed to be any line 
+        starting with a '>' character.
+        
+        :param lines:
+            An iterable of lines.
+        :returns:
+            A generator over the lines that are not part of a thread.
+        """
+        
+        for line in lines:
+            if not line.startswith(THREAD_IDENTIFIER):
+                yield line
+    
+    def _count_lines(self, lines, approximate=False, counter=None):
+        """
+        Count how often each line appears, in a single pass.
+        
+        :param lines:
+            An iterable of lines.
+        :param approximate:
+            By default lines are counted exactly.  If set, they are counted with a
+            :class:`CountMinSketch` instead so memory use doesn't grow with the
+            input.
+        :param counter:
+            If given, carry on counting in to this counter instead of a new one.
+        :returns:
+            A :class:`LineCounter` or :class:`CountMinSketch`.
+        """
+        
+        if counter is None:
+            counter = CountMinSketch() if approximate else LineCounter()
+        
+        for line in lines:
+            counter.add(line)
+        
+        return counter
+    
+    def _remove_duplicate_lines(self, lines, frequency, threshold=HIGH_FREQUENCY_THRESHOLD):
+        """
+        Remove duplicate (or high frequency) lines from the input.  A duplicate, 
+        or high frequency line, is a line that appears at least ``threshold``
+        times in the content, for example the footer Google Groups adds to
+        every message.
+        
+        :param lines:
+            An iterable of lines.
+        :param frequency:
+            The line counts for the whole content, from :meth:`_count_lines`.
+        :param threshold:
+            How many times a line has to appear before it is removed.
+        :returns:
+            A generator over the remaining lines.
+        """
+        
+        for line in lines:
+            if frequency.count(line) < threshold:
+                yield line
+    
+    def _remove_repeated_blocks(self, lines, size=BLOCK_LINES, cache_size=BLOCK_CACHE_SIZE):
+        """
+        Remove blocks of lines we have already seen, such as a message quoted in
+        full (without the '>' on each line) or a footer.  A block is any
+        ``size`` non-blank lines in a row, and is remembered by a hash of its
+        lines (ignoring whitespace at either end).
+        
+        The hash is a rolling one, so moving along a line is just taking off the
+        line leaving the block and adding on the one joining it.  Only the last
+        ``cache_size`` blocks seen are remembered (see :class:`LRUCache`), so
+        memory use stays flat however big the content is.
+        
+        Blank lines are passed straight through (the mapped file doesn't even
+        give us them, see :class:`MappedFile`), so don't break up a block.
+        
+        :param lines:
+            An iterable of lines.
+        :returns:
+            A generator over the remaining lines.
+        """
+        
+        seen = LRUCache(cache_size)
+        window = collections.deque() # The [line, hash, dropped, blank lines before it] in the current block.
+        pending = [] # Blank lines waiting on the line before them to be decided.
+        block = 0
+        
+        # What the hash of the line leaving the block was multiplied up by.
+        oldest = pow(BLOCK_HASH_BASE, size - 1, BLOCK_HASH_MODULUS)
+        
+        for line in lines:
+            stripped = line.strip()
+            
+            if not stripped:
+                if window:
+                    pending.append(line)
+                else:
+                    yield line
+                
+                continue
+            
+            line_hash = hash(stripped)
+            window.append([line, line_hash, False, pending])
+            pending = []
+            block = (block * BLOCK_HASH_BASE + line_hash) % BLOCK_HASH_MODULUS
+            
+            if len(window) < size:
+                continue
+            
+            if seen.get(block) is not None:
+                for entry in window:
+                    entry[2] = True
+            
+            else:
+                seen[block] = True
+            
+            # The oldest line is done with, so it can go (or not).
+            line, line_hash, dropped, blank = window.popleft()
+            block = (block - line_hash * oldest) % BLOCK_HASH_MODULUS
+            
+            for other in blank:
+                yield other
+            
+            if not dropped:
+                yield line
+        
+        for line, line_hash, dropped, blank in window:
+            for other in blank:
+                yield other
+            
+            if not dropped:
+                yield line
+        
+        for line in pending:
+            yield line
+    
+    def _prepare_lines(self, ignore_threads, frequency=None, threshold=HIGH_FREQUENCY_THRESHOLD, tally=False, candidates=False, blocks=True):
+        """
+        Chain together the filtering stages over a fresh read of the content.
+        
+        :param frequency:
+            If given, the line counts used to remove high frequency lines.
+        :param candidates:
+            If set, the lines are only for :meth:`_find_signatures`, so when
+            memory mapping we can leave out those it would pass over anyway.
+            Only if there's no other filtering to change which lines it sees,
+            and no :attr:`scorer` wanting the lines before a signature.
+        :param blocks:
+            If set (and :meth:`parse` was asked to), remove repeated blocks of
+            lines.  Not when counting lines for removing duplicates, as those
+            are removed before the blocks are.
+        :param tally:
+            If set, and we are keeping :attr:`stats`, count the lines read and
+            dropped by each stage.  Only done for the one pass, so lines aren't
+            counted more than once.
+        :returns:
+            An iterator over the filtered lines.
+        """
+        
+        tally = tally and self.stats is not None
+        
+        if isinstance(self._source, MappedFile):
+            lines = None
+            
+            if candidates and self.vectorise and frequency is None and not self._remove_blocks and self.scorer is None:
+                try:
+                    lines = self._source.candidate_lines(self._start, self._end, ignore_threads=ignore_threads, names=self._contacts.indexed("firstname"))
+                except ImportError:
+                    pass # No NumPy, no matter.
+            
+            if lines is None:
+                # Thread (and blank) lines can be dropped before they are copied out of the
+                # file.  Blank lines would be skipped later anyway.
+                lines = self._source.lines(self._start, self._end, ignore_threads=ignore_threads, skip_blank=True)
+            
+            if tally:
+                lines = self._tally_mapped(lines)
+        
+        else:
+            lines = self._read_lines()
+            
+            if tally:
+                lines = self._tally(lines, "lines_read")
+            
+            if ignore_threads:
+                if tally:
+                    lines = self._tally_dropped(lines, "thread_lines", self._remove_thread_lines)
+                else:
+                    lines = self._remove_thread_lines(lines)
+        
+        if frequency is not None:
+            if tally:
+                lines = self._tally_dropped(lines, "duplicate_lines", self._remove_duplicate_lines, frequency, threshold)
+            else:
+                lines = self._remove_duplicate_lines(lines, frequency, threshold)
+        
+        if blocks and self._remove_blocks:
+            if tally:
+                lines = self._tally_dropped(lines, "block_lines", self._remove_repeated_blocks)
+            else:
+                lines = self._remove_repeated_blocks(lines)
+        
+        return lines
+    
+    @contextlib.contextmanager
+    def _stage(self, stage):
+        """
+        Time a stage of the work, if we are keeping :attr:`stats`.
+        """
+        
+        start = time.time()
+        yield
+        
+        if self.stats is not None:
+            self.stats.time(stage, time.time() - start)
+    
+    def _tally(self, lines, counter):
+        """
+        Pass-through stage counting the lines that go by in to :attr:`stats`.
+        """
+        
+        count = 0
+        
+        for line in lines:
+            count += 1
+            yield line
+        
+        self.stats.add(counter, count)
+    
+    def _tally_dropped(self, lines, counter, stage, *args):
+        """
+        Run a filtering stage, counting the lines it drops in to :attr:`stats`.
+        """
+        
+        seen = [0]
+        
+        def counted():
+            for line in lines:
+                seen[0] += 1
+                yield line
+        
+        kept = 0
+        
+        for line in stage(counted(), *args):
+            kept += 1
+            yield line
+        
+        self.stats.add(counter, seen[0] - kept)
+    
+    def _tally_mapped(self, lines):
+        """
+        Like :meth:`_tally`, for the lines from a :class:`MappedFile`, which has
+        already skipped the thread and blank lines (and perhaps more, see
+        :meth:`MappedFile.candidate_lines`) for us.
+        """
+        
+        count = 0
+        
+        for line in lines:
+            count += 1
+            yield line
+        
+        threads, blank = self._source.skipped
+        
+        self.stats.add("lines_read", count + threads + blank + self._source.masked)
+        self.stats.add("thread_lines", threads)
+        self.stats.add("blank_lines", blank)
+        
+        if self._source.masked:
+            self.stats.add("masked_lines", self._source.masked)
+    
+    def _is_reset_line(self, line, ignore_threads, frequency=None, threshold=HIGH_FREQUENCY_THRESHOLD):
+        """
+        Check if a line always leaves :meth:`_find_signatures` outside of a
+        signature, whatever state it was in before.  That is the case for a long
+        line (too long to be in a signature, let alone start one) or a longer
+        header line, as long as it isn't filtered out before it gets there.
+        
+        Note that blank lines are no good for this, they are skipped without
+        touching the state.
+        """
+        
+        if ignore_threads and line.startswith(THREAD_IDENTIFIER):
+            return False
+        
+        if frequency is not None and frequency.count(line) >= threshold:
+            return False
+        
+        tokens = len(line.split())
+        
+        if tokens > SIGNATURE_LINE_LENGTH_LIMIT:
+            return True
+        
+        return tokens > SIGNOFF_LINE_LENGTH_LIMIT and bool(RELAXED_HEADER_REGEX.search(line) or "..." in line)
+    
+    def _find_shards(self, count, ignore_threads, frequency=None, threshold=HIGH_FREQUENCY_THRESHOLD):
+        """
+        Split the loaded content in to (about) ``count`` shards that can be parsed
+        independently.  Each shard (bar the last) ends with a line that resets the
+        signature state machine (see :meth:`_is_reset_line`), so parsing the
+        shards separately finds exactly what parsing the whole would.
+        
+        :returns:
+            A list of shards, either (filename, start, end) byte ranges or lists
+            of lines if the content is in memory.  See :func:`_read_shard`.
+        """
+        
+        filename = self._source_filename()
+        start = self._start
+        index = None
+        
+        if self._source is None:
+            size = len(self._lines)
+        else:
+            size = os.path.getsize(filename) if self._end is None else self._end
+            fd = open(filename, "rb")
+            
+            # If the dump has been indexed we can split it between messages, which
+            # only works if the lines ending them aren't being filtered out.
+            if frequency is None:
+                index = self._load_index(filename, ignore_threads)
+        
+        boundaries = [start]
+        
+        try:
+            for shard in range(1, count):
+                position = max(start + (size - start) * shard // count, boundaries[-1])
+                
+                # Move forward to the end of the next reset line.
+                if self._source is None:
+                    while position < size:
+                        position += 1
+                        if self._is_reset_line(self._lines[position - 1], ignore_threads, frequency, threshold):
+                            break
+                
+                elif index is not None and index.next_start(position) is not None:
+                    position = index.next_start(position)
+                
+                else:
+                    fd.seek(position)
+                    if position:
+                        position += len(fd.readline())
+                    
+                    for line in iter(fd.readline, ""):
+                        position += len(line)
+                        if self._is_reset_line(line, ignore_threads, frequency, threshold):
+                            break
+                
+                if boundaries[-1] < position < size:
+                    boundaries.append(position)
+        
+        finally:
+            if self._source is not None:
+                fd.close()
+        
+        boundaries.append(size)
+        
+        if self._source is None:
+            return [self._lines[start:end] for start, end in zip(boundaries, boundaries[1:])]
+        
+        return [(filename, start, end) for start, end in zip(boundaries, boundaries[1:])]
+    
+    def _parse_parallel(self, jobs, ignore_threads, remove_duplicate, threshold, approximate, frequency=None, signature_state=None, remove_blocks=False):
+        """
+        Parse the content over a pool of processes.  See :meth:`parse`.
+        
+        The content is split in to shards, names are found in each shard in
+        parallel and merged (in order) in to our contacts, then signatures are
+        found in each shard in parallel against a copy of those contacts and the
+        details found merged back, again in order.
+        
+        :param frequency:
+            Line counts to carry on counting in to, when resuming.
+        :param signature_state:
+            The signature state to start the first shard in, when resuming.
+        :param remove_blocks:
+            Remove repeated blocks of lines, within each shard.
+        :returns:
+            A tuple of the signature state at the end and the line counts (if
+            duplicates were removed).
+        """
+        
+        import multiprocessing
+        
+        if self._source is not None and self._source_filename() is None:
+            raise Exception("Parallel parsing needs a filename, or content loaded in to memory.")
+        
+        if not remove_duplicate:
+            frequency = None
+        
+        elif approximate:
+            # Merging sketches is slower than just counting, so we do that here.
+            with self._stage("count"):
+                frequency = self._count_lines(self._prepare_lines(ignore_threads, blocks=False), approximate, frequency)
+                frequency.confirm(self._prepare_lines(ignore_threads, blocks=False), threshold)
+        
+        else:
+            if frequency is None:
+                frequency = LineCounter()
+            
+            pool = multiprocessing.Pool(jobs, _init_worker, ({"ignore_threads": ignore_threads},))
+            
+            try:
+                with self._stage("count"):
+                    for counter in pool.imap(_parallel_count_lines, self._find_shards(jobs, ignore_threads)):
+                        frequency.update(counter)
+            
+            finally:
+                pool.terminate()
+        
+        with self._stage("shards"):
+            shards = self._find_shards(jobs * SHARDS_PER_JOB, ignore_threads, frequency, threshold)
+        
+        return self._parse_shards(jobs, shards, ignore_threads, frequency, threshold, signature_state, remove_blocks), frequency
+    
+    def _parse_shards(self, jobs, shards, ignore_threads, frequency=None, threshold=HIGH_FREQUENCY_THRESHOLD, signature_state=None, remove_blocks=False):
+        """
+        Find the names and then the signatures in each of the shards, over a pool
+        of processes.  See :meth:`_parse_parallel`.
+        
+        :param shards:
+            The shards, as from :meth:`_find_shards`.
+        :returns:
+            The signature state at the end of the last shard.
+        """
+        
+        import cPickle
+        import multiprocessing
+        
+        state = {"ignore_threads": ignore_threads, "frequency": frequency, "threshold": threshold, "remove_blocks": remove_blocks, "stats": self.stats is not None,
+                 "scorer": None if self.scorer is None else self.scorer.settings()}
+        
+        # The shards are handed out in groups, so lots of little ones (see
+        # :meth:`extract_many`) don't each cost a task.
+        size = max(1, len(shards) // (jobs * SHARDS_PER_JOB))
+        groups = [shards[start:start + size] for start in range(0, len(shards), size)]
+        
+        # Find the names in each shard, and add any we don't already have.
+        pool = multiprocessing.Pool(jobs, _init_worker, (state,))
+        
+        try:
+            with self._stage("names"):
+                for contacts, stats in pool.imap(_parallel_find_names, groups):
+                    if stats is not None:
+                        self.stats.update(stats)
+                    
+                    for contact in contacts:
+                        if not self._contacts.search_first_email(contact.email[0], firstname=contact.firstname, lastname=contact.lastname, othernames=contact.othernames):
+                            self._contacts.add(contact)
+        
+        finally:
+            pool.terminate()
+        
+        # Now the signatures, each shard gets its own copy of the contacts.
+        state["contacts"] = cPickle.dumps(self._contacts, cPickle.HIGHEST_PROTOCOL)
+        pool = multiprocessing.Pool(jobs, _init_worker, (state,))
+        
+        # Shards after the first start on a reset line, so only the first needs the
+        # state we are resuming from.
+        frozen = self._freeze_state(signature_state)
+        tasks = [(group, None) for group in groups]
+        if tasks:
+            tasks[0] = (groups[0], frozen)
+        
+        try:
+            with self._stage("signatures"):
+                for changes, counts, scores, frozen, stats in pool.imap(_parallel_find_signatures, tasks):
+                    self.gate.update(counts)
+                    
+                    if scores is not None:
+                        self.scorer.update(scores)
+                    
+                    if stats is not None:
+                        self.stats.update(stats)
+                    
+                    for position, details in changes:
+                        contact = self._contacts[position]
+                        
+                        for attribute, value in details.items():
+                            if not isinstance(value, list):
+                                setattr(contact, attribute, value)
+                                continue
+                            
+                            current = getattr(contact, attribute) or []
+                            added = [item for position, item in enumerate(value) if item not in current and item not in value[:position]]
+                            
+                            # A new list rather than appending, so our indexes are told.
+                            if added or getattr(contact, attribute) is None:
+                                setattr(contact, attribute, current + added)
+        
+        finally:
+            pool.terminate()
+        
+        return self._thaw_state(frozen)
+    
+    def _freeze_state(self, state):
+        """
+        Turn a signature state (see :meth:`_find_signatures`) in to one that can
+        be pickled separately from our contacts, by swapping the contact for its
+        position in the list.
+        """
+        
+        if state is None:
+            return None
+        
+        current, contact, count = state
+        position = None
+        
+        if contact is not None:
+            for position, other in enumerate(self._contacts):
+                if other is contact:
+                    break
+        
+        return current, position, count
+    
+    def _thaw_state(self, frozen):
+        """
+        The reverse of :meth:`_freeze_state`.
+        """
+        
+        if frozen is None:
+            return None
+        
+        current, position, count = frozen
+        
+        return current, None if position is None else self._contacts[position], count
+    
+    def parse(self, ignore_threads=True, remove_duplicate=False, threshold=HIGH_FREQUENCY_THRESHOLD, approximate=False, jobs=1, checkpoint=None, remove_blocks=False):
+        """
+        Main method for parsing the contents of the file (which must have been
+        previously loaded through a call to the :meth:`load` method.
+        
+        Each pass is a chain of generators over the content, so no pass builds a
+        copy of the input.  If the content can be read more than once we make two
+        passes: the first collects all the names, the second looks for signatures.
+        If it can only be read once (a pipe or generator), names are discovered as
+        we go, so a signature is only picked up if its author's header appears
+        before it in the dump (and a header seen again after the signature has
+        added more emails will give a second contact).
+        
+        :param ignore_threads:
+            By default, threads will be ignored from the input.  A thread is 
+            deemed to be any line starting with a '>' character.
+        :param remove_duplicate:
+            By default, duplicate (or high frequency) lines will not be removed 
+            from the input.  Doing so needs an extra pass to count the lines, so
+            the content must be readable more than once.
+        :param threshold:
+            How many times a line has to appear to count as a duplicate.
+        :param approximate:
+            Count lines with a sketch when removing duplicates, so only the lines
+            that might be frequent are remembered.  This takes one more pass.
+            See :class:`CountMinSketch`.
+        :param jobs:
+            By default everything happens in this process.  If more than one, the
+            content is parsed by a pool of that many processes instead.  This
+            needs the content to be loaded in memory, or streamed from a filename.
+            Repeated blocks (see below) are then only spotted within the piece
+            of the content each process is given.
+        :param checkpoint:
+            The name of a checkpoint file, for dumps that only ever grow by having
+            more appended to them (such as a mailing list archive).  If it exists,
+            our contacts and where we got up to are picked up from it and only the
+            content added since is parsed, then it is updated for next time.  This
+            needs the content to be streamed from a filename.
+        :param remove_blocks:
+            By default, every line is looked at.  If set, blocks of lines that
+            have been seen before (messages quoted in full, footers, signatures
+            we've already had) are skipped.  See :meth:`_remove_repeated_blocks`.
+        
+        Note that a resumed parse only looks at the new content, so a name first
+        seen there won't help find signatures that came before it (and when
+        removing duplicates, the counts only say what was a duplicate so far).
+        The last line is left for the next run if it isn't finished yet.
+        """
+        
+        if self._source is None and not self._lines:
+            raise Exception("A file must be loaded first using the load method.")
+        
+        frequency = state = None
+        settings = (ignore_threads, remove_duplicate, threshold, approximate, remove_blocks, None if self.scorer is None else self.scorer.settings())
+        
+        if checkpoint is not None:
+            with self._stage("checkpoint"):
+                frequency, state = self._load_checkpoint(checkpoint, settings)
+        
+        self._contacts.stats = self.stats
+        self._remove_blocks = remove_blocks
+        
+        if jobs > 1:
+            state, frequency = self._parse_parallel(jobs, ignore_threads, remove_duplicate, threshold, approximate, frequency, state, remove_blocks)
+        
+        else:
+            if remove_duplicate:
+                if not self._is_rewindable():
+                    raise Exception("Duplicate lines can only be removed if the content can be read more than once.")
+                
+                with self._stage("count"):
+                    frequency = self._count_lines(self._prepare_lines(ignore_threads, blocks=False), approximate, frequency)
+                    
+                    if approximate:
+                        frequency.confirm(self._prepare_lines(ignore_threads, blocks=False), threshold)
+            
+            if self._is_rewindable():
+                # This will populate our contacts list with some names that will then help us 
+                # find signatures later.
+                with self._stage("names"):
+                    for line in self._find_names(self._prepare_lines(ignore_threads, frequency, threshold)):
+                        pass
+                
+                # Find the signatures!  Yay!
+                with self._stage("signatures"):
+                    state = self._find_signatures(self._prepare_lines(ignore_threads, frequency, threshold, tally=True, candidates=True), state)
+            
+            else:
+                # We only get one go at the content, so pick up names and signatures together.
+                with self._stage("names_and_signatures"):
+                    state = self._find_signatures(self._find_names(self._prepare_lines(ignore_threads, frequency, threshold, tally=True)), state)
+        
+        if checkpoint is not None:
+            with self._stage("checkpoint"):
+                self._save_checkpoint(checkpoint, settings, frequency, state)
+        
+        if self.stats is not None:
+            # The gate keeps its own counts, we just take a copy.
+            self.stats.counters.update([("gate_%s" % key, value) for key, value in self.gate.counts().items()])
+            
+            if self.scorer is not None:
+                counts = self.scorer.counts()
+                self.stats.counters.update([("scorer_%s" % key, counts[key]) for key in ("accepted", "rejected")])
+                self.stats.counters.update([("scorer_score_%d" % score, count) for score, count in counts["scores"].items()])
+    
+    def store(self, filename):
+        """
+        Add the contacts we have found to a :class:`ContactStore`, along with
+        those from earlier runs.
+        
+        :param filename:
+            The name of the SQLite database, it is created if need be.
+        """
+        
+        with self._stage("store"):
+            store = ContactStore(filename)
+            try:
+                store.add_all(self._contacts)
+            finally:
+                store.close()
+    
+    def resolve(self, fields=RESOLVE_FIELDS):
+        """
+        Merge the contacts we have found that are really the same person, for
+        example someone who has signed off with two different email addresses.
+        See :class:`ContactResolver`.
+        
+        :param fields:
+            The fields to merge on, by default :data:`RESOLVE_FIELDS`.
+        :returns:
+            The number of contacts merged away.
+        """
+        
+        with self._stage("resolve"):
+            merged = ContactResolver(fields).resolve(self._contacts)
+        
+        if self.stats is not None:
+            self.stats.add("contacts_merged", merged)
+        
+        return merged
+    
+    def extract_many(self, sources=(), messages=(), ignore_threads=True, jobs=1):
+        """
+        Extract the contacts from a batch of inputs in one go, for when there are
+        lots of small files or messages rather than one big dump.  The inputs
+        don't need loading first, and whatever was loaded isn't touched.
+        
+        All the inputs share our contacts, so a name from one input helps find
+        signatures in the others (and in later batches), and a contact found in
+        more than one input is only added once.  Each input starts outside of a
+        signature.
+        
+        :param sources:
+            Filenames, file objects or iterables of lines.
+        :param messages:
+            The content of messages, as strings (or anything that can be turned
+            in to one, such as a bytearray, buffer or memoryview).
+        :param ignore_threads:
+            By default, threads will be ignored.  See :meth:`parse`.
+        :param jobs:
+            By default everything happens in this process.  If more than one, the
+            inputs are shared between a pool of that many processes instead.
+        :returns:
+            Our contacts.
+        """
+        
+        shards = []
+        
+        for source in sources:
+            if isinstance(source, basestring):
+                shards.append((source, 0, None))
+            else:
+                shards.append(list(source))
+        
+        for message in messages:
+            if not isinstance(message, basestring):
+                # A memoryview's str() is its repr, not its contents.
+                message = message.tobytes() if hasattr(message, "tobytes") else str(message)
+            
+            shards.append(message.splitlines(True))
+        
+        self._contacts.stats = self.stats
+        
+        if jobs > 1:
+            self._parse_shards(jobs, shards, ignore_threads)
+        
+        else:
+            with self._stage("names"):
+                for shard in shards:
+                    for line in self._find_names(self._shard_lines(shard, ignore_threads)):
+                        pass
+            
+            with self._stage("signatures"):
+                for shard in shards:
+                    self._find_signatures(self._shard_lines(shard, ignore_threads))
+        
+        return self._contacts
+    
+    def extract_message(self, message, ignore_threads=True):
         """
-        Make a vcard representation of this contact.
+        Extract the contacts from a single message, as with :meth:`extract_many`
+        (so they are added to our contacts too).
         
-        :return:
-            String/buffer serialisation of the vcard.
+        :param message:
+            The content of the message.
+        :returns:
+            A list of the contacts named in the message, in a header or by a
+            signature, in the order they first appear.
         """
         
-        card = vobject.vCard()
+        self._found = []
         
-        card.add("n")
-        card.n.value = vobject.vcard.Name(family=self.lastname, given=self.firstname)
+        try:
+            self.extract_many(messages=[message], ignore_threads=ignore_threads)
+            found = self._found
         
-        card.add('fn')
-        card.fn.value = "%s %s %s" % (self.firstname, self.othernames, self.lastname)
+        finally:
+            self._found = None
         
-        for attribute in ("skype", "twitter"):
-            if hasattr(self, attribute):
-                content = vobject.vcard.ContentLine("EMAIL", {}, getattr(self, attribute))
-                card.add(content)
+        contacts = []
+        seen = set()
         
-        for attribute in ("email", "url", "phone"):
-            if hasattr(self, attribute):
-                for value in getattr(self, attribute):
-                    if attribute == "phone":
-                        content = vobject.vcard.ContentLine("TEL", {}, value["number"])
-                    elif attribute == "email":
-                        content = vobject.vcard.ContentLine("EMAIL", {}, value)
-                    elif attribute == "url":
-                        content = vobject.vcard.ContentLine("URL", {}, value)
-                
-                card.add(content)
+        for contact in found:
+            if id(contact) not in seen:
+                seen.add(id(contact))
+                contacts.append(contact)
         
-        return card.serialize()
-
-class ContactsList(list):
-    """
-    Utility class for storing a list of contacts.
-    """
+        return contacts
     
-    def add(self, contact):
+    def _shard_lines(self, shard, ignore_threads):
         """
-        Add a new contact to the list.
-        
-        :param contact:
-            An instance of :class:`Contact`.
+        :returns:
+            An iterator over the lines of a shard (see :func:`_read_shard`), with
+            thread lines removed if wanted.
         """
         
-        self.append(contact)
-    
-    def search(self, **kwargs):
-        """
-        Very basic search function to pull out matching
-        contacts.  Exact string matching only, arguments are AND together.
+        lines = _read_shard(shard)
         
-        Looks for each keyword argument as an attribute on every
-        contact.  If attribute exists, and is exact match, bingo!
+        if ignore_threads:
+            lines = self._remove_thread_lines(lines)
         
+        return lines
+    
+    def _line_end(self, filename):
+        """
         :returns:
-            A list of contacts!
+            The byte offset just past the last complete line of a file, so a
+            line still being written isn't parsed until it is finished.
         """
         
-        matches = []
-        
-        for contact in self:
-            if all([(hasattr(contact, key) and getattr(contact, key) == value) for key, value in kwargs.items()]):
-                matches.append(contact)
+        with open(filename, "rb") as fd:
+            fd.seek(0, 2)
+            position = fd.tell()
+            
+            while position:
+                start = max(position - CHECKPOINT_SAMPLE_SIZE, 0)
+                fd.seek(start)
+                found = fd.read(position - start).rfind("\n")
+                
+                if found != -1:
+                    return start + found + 1
+                
+                position = start
         
-        return matches
-
-class Extractor(object):
-    """
-    Class for extacting email signatures from a dump of emails.
-    """
+        return 0
     
-    def __init__(self):
+    def _fingerprint(self, filename, offset):
         """
-        Initialise the object.
+        :returns:
+            A digest of the content just before the given offset, used to check
+            the file is the one we checkpointed (and has only been appended to).
         """
         
-        self._lines = [] # Define variable for holding the file contents.
-        self._contacts = ContactsList() # Define variable for holding the contacts that we find.
-    
-    def load(self, filename):
-        """
-        Read the contents of the file.  This file (for example data/emails.txt)
-        should be the file we wish to extract signatures from.
+        import hashlib
         
-        .. warning::
-            This is potentially inefficient as we read the entire file in in one
-            go and keep it in memory.  We might wish to restructure this to use 
-            an iterator to keep less of the file in memory, however this might
-            break parts of the algorithm.
+        with open(filename, "rb") as fd:
+            start = max(offset - CHECKPOINT_SAMPLE_SIZE, 0)
+            fd.seek(start)
+            sample = fd.read(offset - start)
         
-        :param filename:
-            The name of the file on disk to load.
-        """
+        if len(sample) != offset - start:
+            return None
         
-        with open(filename) as fd:
-            self._lines = fd.readlines()
+        return hashlib.md5(sample).hexdigest()
     
-    def _remove_thread_lines(self):
-        """
-        Remove thread lines from the input.  A thread is deemed to be any line 
-        starting with a '>' character.
+    def _load_checkpoint(self, checkpoint, settings):
         """
+        Pick up where a previous :meth:`parse` left off, if we can.  If there is no
+        checkpoint, it was made with different settings or the file has changed
+        (other than being added to) we start from the beginning.
         
-        self._lines = [line for line in self._lines if not line.startswith(THREAD_IDENTIFIER)]
-    
-    def _remove_duplicate_lines(self):
-        """
-        Remove duplicate (or high frequency) lines from the input.  A duplicate, 
-        or high frequency line, is a line that appears more than 90 times in 
-        the content
+        :param checkpoint:
+            The name of the checkpoint file.
+        :param settings:
+            The settings used for parsing, these have to match those saved.
+        :returns:
+            A tuple of the line counts (or None) and the signature state (or None)
+            to carry on with.
         """
         
-        def histogram(in_):
-            """
-            Return a histogram of values from the input data.
-            
-            Could use a collections.Counter in Python2.7 if we so wished...
-            
-            :param in_:
-                A list of data.
-            :returns:
-                A dictionary, keyed by the line, value is occurence count.
-            """
-            
-            hist = {}
-            for value in in_ and value not in hist:
-                hist[value] = in_.count(value)
-            
-            return hist
+        import cPickle
+        import gzip
+        
+        filename = self._source_filename()
+        
+        if filename is None:
+            raise Exception("Checkpoints need the content to be streamed from a filename.")
+        
+        self._start, self._end = 0, self._line_end(filename)
+        
+        if not os.path.exists(checkpoint):
+            return None, None
+        
+        fd = gzip.open(checkpoint, "rb")
+        try:
+            saved = cPickle.load(fd)
+        finally:
+            fd.close()
         
-        frequency = histogram(self._lines)
+        if saved["version"] != CHECKPOINT_VERSION or saved["settings"] != settings:
+            return None, None
         
-        # Remove lines that appear too often.
-        for value, count in frequency.iteritems():
-            if count >= HIGH_FREQUENCY_THRESHOLD:
-                self._remove_lines(value)
+        if saved["offset"] > self._end or saved["fingerprint"] != self._fingerprint(filename, saved["offset"]):
+            return None, None
+        
+        self._start = saved["offset"]
+        self._contacts = saved["contacts"]
+        
+        return saved["frequency"], self._thaw_state(saved["state"])
     
-    def _remove_lines(self, in_):
+    def _save_checkpoint(self, checkpoint, settings, frequency, state):
         """
-        Remove all occurences of the given line from the inputted content.
-        
-        :param in_:
-            A line from the file.
+        Save where we got up to, for the next :meth:`parse` to pick up.  The file
+        is replaced in one go so an interrupted save leaves the old one intact.
         """
         
-        self._lines = [line for line in self._lines if line != in_]
+        import cPickle
+        import gzip
+        
+        saved = {
+            "version": CHECKPOINT_VERSION,
+            "settings": settings,
+            "offset": self._end,
+            "fingerprint": self._fingerprint(self._source_filename(), self._end),
+            "contacts": self._contacts,
+            "frequency": frequency,
+            "state": self._freeze_state(state),
+        }
+        
+        temporary = "%s.tmp" % checkpoint
+        fd = gzip.open(temporary, "wb")
+        try:
+            cPickle.dump(saved, fd, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            fd.close()
+        
+        os.rename(temporary, checkpoint)
     
-    def parse(self, ignore_threads=True, remove_duplicate=False):
+    def index_messages(self, filename, ignore_threads=True):
         """
-        Main method for parsing the contents of the file (which must have been
-        previously loaded through a call to the :meth:`load` method.
+        Find where each message in a dump starts, see :class:`MessageIndex`.  The
+        index is saved next to the dump (with :data:`INDEX_SUFFIX` on the end of
+        the name) and picked up again next time, so if the dump has only been
+        added to since, only the new part is read.
         
-        .. warning::
-            This is potentially inefficient as we read the :attr:`_lines` variable 
-            multiple times.  For large files this might be costly, consider
-            restructuring.
+        With an index, a message can be parsed on its own by loading just its
+        byte range (see :meth:`load`), and parsing in parallel splits the dump
+        between messages without looking for somewhere to split.
         
+        :param filename:
+            The name of the dump.
         :param ignore_threads:
-            By default, threads will be ignored from the input.  A thread is 
-            deemed to be any line starting with a '>' character.
-        :param remove_duplicate:
-            By default, duplicate (or high frequency) lines will not be removed 
-            from the input.
+            Whether thread lines will be ignored when parsing, see :meth:`parse`.
+        :returns:
+            A :class:`MessageIndex`.
         """
         
-        if not self._lines:
-            raise Exception("A file must be loaded first using the load method.")
+        end = self._line_end(filename)
+        index = self._load_index(filename, ignore_threads)
         
-        if ignore_threads:
-            self._remove_thread_lines()
+        if index is not None and index.size == end:
+            return index
+        
+        if index is None:
+            index = MessageIndex(ignore_threads)
+        
+        with self._stage("index"):
+            position = index.size
+            
+            for line in self._read_file(filename, position, end):
+                if index.pending:
+                    # Thread and blank lines after the header still belong to its message.
+                    if not line.strip() or (ignore_threads and line.startswith(THREAD_IDENTIFIER)):
+                        position += len(line)
+                        continue
+                    
+                    index.offsets.append(position)
+                    index.pending = False
+                
+                # A header has an email address in it, or "wrote:", which is quick to check first.
+                if ("wrote:" in line or "@" in line) and self._is_reset_line(line, ignore_threads) and ("wrote:" in line or RELAXED_HEADER_REGEX.search(line)):
+                    index.pending = True
+                
+                position += len(line)
+            
+            index.size = end
+            index.fingerprint = self._fingerprint(filename, end)
+            index.save(filename + INDEX_SUFFIX)
+        
+        return index
+    
+    def _load_index(self, filename, ignore_threads):
+        """
+        :returns:
+            The saved :class:`MessageIndex` for a dump, or None if there isn't
+            one we can use (it was made for different settings, or the dump has
+            changed other than being added to).
+        """
         
-        if remove_duplicate:
-            self._remove_duplicate_lines()
+        index = MessageIndex.load(filename + INDEX_SUFFIX)
         
-        # This will populate our contacts list with some names that will then help us 
-        # find signatures later.
-        self._find_names()
+        if index is None or index.ignore_threads != ignore_threads:
+            return None
         
-        # Find the signatures!  Yay!
-        self._find_signatures()
+        if index.size > os.path.getsize(filename) or index.fingerprint != self._fingerprint(filename, index.size):
+            return None
+        
+        return index
     
-    def _find_names(self):
+    def _find_names(self, lines):
         """
         Search for email headers in inputted content to help identify potential 
         signatures later on in our processing.
         
         A header is of the form:
             On Jun 15, 9:06 am, Rob James <james@gmail.com> wrote:
+        
+        This is a pass-through stage, every line is handed back once it has been
+        looked at so that it can be chained in to :meth:`_find_signatures`.
+        
+        :param lines:
+            An iterable of lines.
+        :returns:
+            A generator over the same lines.
+        """
+        
+        for line in lines:
+            self._find_name(line)
+            yield line
+    
+    def _find_name(self, line):
+        """
+        Look for an email header on a single line, and if there is one add the
+        name (and email) to our contacts.
+        
+        :param line:
+            A line from the file.
         """
         
-        for line in self._lines:
-            match = re.search(EMAIL_HEADER_REGEX, line)
+        match = EMAIL_HEADER_REGEX.search(line)
+        
+        if match:
+            groups = match.groupdict()
             
-            if match:
-                groups = match.groupdict()
-                
-                # We don't care about emails which aren't fully formed.  Some of 
-                # the emails contain ellipses '...' which is no use to us, for example:
-                # On Jun 15, 9:06 am, Rob James <james....@gmail.com> wrote:
-                # I thought I could not match these using a negative lookahead assetion 
-                # in the regex, but that either doesn't do what I think, or I am using
-                # it incorrectly as we still pick them up.  We filter them out here.
-                email = groups["email"]
-                if "..." in email:
-                    continue
-                
-                # Pull out the first, last and other names.
-                name = groups["name"].split()
-                first = name[0]
-                last = name[-1] if len(name) >= 2 else ""
-                other = " ".join(name[1:-1]) if len(name) > 2 else ""
-                
-                # We have our first contact!  Add it to our list of contacts if we don't
-                # have it already.
-                if not self._contacts.search(firstname=first, lastname=last, othernames=other, email=[email]):
-                    contact = Contact(firstname=first, lastname=last, othernames=other, email=[email])
-                    self._contacts.add(contact)
+            # We don't care about emails which aren't fully formed.  Some of 
+            # the emails contain ellipses '...' which is no use to us, for example:
+            # On Jun 15, 9:06 am, Rob James <james....@gmail.com> wrote:
+            # I thought I could not match these using a negative lookahead assetion 
+            # in the regex, but that either doesn't do what I think, or I am using
+            # it incorrectly as we still pick them up.  We filter them out here.
+            email = groups["email"]
+            if "..." in email:
+                return
+            
+            # Pull out the first, last and other names.
+            name = groups["name"].split()
+            first = name[0]
+            last = name[-1] if len(name) >= 2 else ""
+            other = " ".join(name[1:-1]) if len(name) > 2 else ""
+            
+            # We have our first contact!  Add it to our list of contacts if we don't
+            # have it already.
+            matches = self._contacts.search_first_email(email, firstname=first, lastname=last, othernames=other)
+            if not matches:
+                contact = Contact(firstname=first, lastname=last, othernames=other, email=[email])
+                self._contacts.add(contact)
+                matches = [contact]
+            
+            if self._found is not None:
+                self._found.extend(matches)
     
-    def _find_signatures(self):
+    def _find_signatures(self, lines, state=None):
         """
         Search for signatures using various helpers and extract the contact information,
         add this to our contact list!
@@ -350,27 +3345,69 @@ class Extractor(object):
         This is kinda like a mini state machine I guess.  Could be expanded to a more formal
         one.
         
+        If we have a :attr:`scorer`, what is found in a signature is held back until
+        it ends and only added to the contact if the signature scores well enough.
+        A signoff then ends a signature too, as does the end of the lines, so we
+        always finish outside of one.
+        
         .. todo::
-            Still lots of work to be done here to improve things.  A confidence rating might help
-            to help identify signatures, better use of the signoff etc. etc.
+            Still lots of work to be done here to improve things, better use of the
+            signoff etc. etc.
+        
+        :param lines:
+            An iterable of lines.
+        :param state:
+            The state to start in, as returned from an earlier call.  By default we
+            start outside of a signature.
+        :returns:
+            The state we finished in, a tuple of the current state, the contact
+            whose signature we are in (or None) and the signature line count.
         """
         
-        # Some useful limits.
-        SIGNOFF_LINE_LENGTH_LIMIT = 3
-        SIGNATURE_LINE_LENGTH_LIMIT = 10
-        SIGNATURE_LINE_COUNT_LIMIT = 15
+        gate = self.gate
+        gate.names = self._contacts.indexed("firstname")
+        scorer = self.scorer
+        recent = None if scorer is None else scorer.recent
         
         # Manage the state.
         CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
         FOUND_CONTACT = None
         SIGNATURE_LINE_COUNT = 0
+        PREVIOUS_LINE = None # The signature's last line, an address's street can be on it.
+        
+        if state is not None:
+            CURRENT_STATE, FOUND_CONTACT, SIGNATURE_LINE_COUNT = state
+        
+        # Counted for the stats, these are cheap enough to always count.
+        BLANK_LINES = 0
+        TRANSITIONS = dict.fromkeys(("entered", "ambiguous", "long_line", "line_count", "header", "signoff"), 0)
+        
+        scan = self._scan_line if self.stats is None else self._scan_line_counted
+        cache = self._scanned
+        
+        if cache is not None:
+            # The same lines (phone numbers, web sites) turn up in every signature someone
+            # writes, so remember what we found in them.  Nothing changes the fields.
+            hits, misses = cache.hits, cache.misses
+            uncached = scan
+            
+            def scan(line):
+                fields = cache.get(line)
+                if fields is None:
+                    fields = cache[line] = uncached(line)
+                
+                return fields
         
-        for line in self._lines:
+        for line in lines:
             # Perhaps these lines should be cleared out earlier?
             if not line.strip():
+                BLANK_LINES += 1
                 continue
             
             if CURRENT_STATE == STATES.OUTSIDE_SIGNATURE:
+                if recent is not None:
+                    recent.append(line)
+                
                 # If we are in this state, then we are trying to find a signature, or the
                 # start of one.  Given we know the signature comes at the end of the email, 
                 # after a signoff string or a name, we know we only need consider:
@@ -378,25 +3415,17 @@ class Extractor(object):
                 #      few words can be ignored.
                 #    * lines which contain a signoff.
                 #    * lines which contain a name we found earlier in our call to :meth:`_find_names`.
-                tokens = line.split()
-                if len(tokens) > SIGNOFF_LINE_LENGTH_LIMIT:
+                # The gate checks all that (and spots signoffs) cheaply, most lines stop here.
+                tokens = gate.check(line)
+                if tokens is None:
                     continue
                 
-                # Perhaps the line contains a name... let's try and find it.
+                # The line starts with a name... let's try and find it.
                 first = tokens[0]
                 last = tokens[-1] if len(tokens) >= 2 else ""
                 
                 matches = self._contacts.search(firstname=first)
-                if len(matches) == 0:
-                    # No contact found, perhaps it wasn't a name after all...
-                    if line.lower() in POSSIBLE_SIGNOFFS:
-                        # It's a signoff string, should give us confidence we are 
-                        # getting close to the signature....
-                        pass
-                    
-                    continue
-                
-                elif len(matches) > 1:
+                if len(matches) > 1:
                     # More than one match found, perhaps we can match on lastname too?
                     matches = self._contacts.search(firstname=first, lastname=last)
                     
@@ -404,14 +3433,23 @@ class Extractor(object):
                     # Can't think of a way to resolve this right now.
                     if len(matches) != 1:
                         #print "AMBIG", first, "**",last,"**", tokens, line
+                        TRANSITIONS["ambiguous"] += 1
                         continue
                     
                     # If we get this far, we have one match only, we can't match 0 contacts
-                    # as otherwise we wouldn't have entered this block to begin with.
+                    # as otherwise the gate wouldn't have let us in to begin with.
                 
                 # Yay, we found a match, assume that means a signature is coming next.
                 CURRENT_STATE = STATES.INSIDE_SIGNATURE
                 FOUND_CONTACT = matches[0]
+                PREVIOUS_LINE = line
+                TRANSITIONS["entered"] += 1
+                
+                if scorer is not None:
+                    scorer.start(FOUND_CONTACT, tokens)
+                
+                elif self._found is not None:
+                    self._found.append(FOUND_CONTACT)
             
             elif CURRENT_STATE == STATES.INSIDE_SIGNATURE:
                 SIGNATURE_LINE_COUNT += 1
@@ -425,6 +3463,23 @@ class Extractor(object):
                     CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
                     FOUND_CONTACT = None
                     SIGNATURE_LINE_COUNT = 0
+                    TRANSITIONS["long_line"] += 1
+                    
+                    if scorer is not None:
+                        self._keep_signature()
+                    
+                    continue
+                
+                # A signoff means a signature is coming next, so (if we are being careful)
+                # this can't have been one.
+                if scorer is not None and scorer.is_signoff(tokens):
+                    CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
+                    FOUND_CONTACT = None
+                    SIGNATURE_LINE_COUNT = 0
+                    TRANSITIONS["signoff"] += 1
+                    
+                    self._keep_signature()
+                    recent.append(line)
                     continue
                 
                 # Or, if we have been inside a signature for a while now, perhaps it's time to
@@ -433,95 +3488,226 @@ class Extractor(object):
                     CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
                     FOUND_CONTACT = None
                     SIGNATURE_LINE_COUNT = 0
+                    TRANSITIONS["line_count"] += 1
+                    
+                    if scorer is not None:
+                        self._keep_signature()
+                    
                     continue
                 
                 # We are still picking up lines that look like:
                 #    On Oct 20, 11:12 am, drllau <drlawrence...@gmail.com> wrote:
                 # So we force those to disappear!  We also know that if we found one, we have
                 # reached the end of our signature.
-                if re.search(RELAXED_HEADER_REGEX, line) or "..." in line:
+                if RELAXED_HEADER_REGEX.search(line) or "..." in line:
                     CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
                     FOUND_CONTACT = None
                     SIGNATURE_LINE_COUNT = 0
+                    TRANSITIONS["header"] += 1
+                    
+                    if scorer is not None:
+                        self._keep_signature()
+                    
                     continue
                 
                 # So, we got this far, we think we have a signature!!  Let's do some matching...
-                # First, let's look for a skype name, this is nice and simple.
-                skype = self._match_skype(line)
-                if skype:
-                    FOUND_CONTACT.skype = skype
-                    # Don't look for anything else!
-                    continue
+                fields = scan(line)
                 
-                # Next we look for twitter as that is also quite simple.  
-                twitter = self._match_twitter(line)
-                if twitter:
-                    FOUND_CONTACT.twitter = twitter
-                    # Don't look for anything else!
-                    continue
+                # An address without a street might have had it on the line before.
+                if fields[5] is not None and fields[5][0] is None and PREVIOUS_LINE is not None:
+                    street = self.gazetteer.find_street(PREVIOUS_LINE)
+                    if street is not None:
+                        fields = fields[:5] + ((street, fields[5][1]),)
                 
-                # Next we look for a phone number, and we know there might be more than one on
-                # a line, so...
-                numbers = self._match_phone(line)
-                if numbers:
-                    # We might have more than one phone number so we store a list.
-                    if not hasattr(FOUND_CONTACT, "phone"):
-                        FOUND_CONTACT.phone = []
-                    
-                    # And this time we store the phone number as a dict.
-                    for number in numbers:
-                        if number not in FOUND_CONTACT.phone:
-                            FOUND_CONTACT.phone.append(number)
-                
-                # Now look for an email address...
-                email = self._match_email(line)
-                if email:
-                    # We might have more than one email so we store a list.
-                    if not hasattr(FOUND_CONTACT, "email"):
-                        FOUND_CONTACT.email = []
-                    
-                    if email not in FOUND_CONTACT.email:
-                        FOUND_CONTACT.email.append(email)
-                
-                # And last but not least, look for a url... 
-                url = self._match_url(line)
-                if url and "@" not in url:
-                    # We might have more than one url so we store a list.
-                    if not hasattr(FOUND_CONTACT, "url"):
-                        FOUND_CONTACT.url = []
-                    
-                    if url not in FOUND_CONTACT.url:
-                        FOUND_CONTACT.url.append(url)
+                PREVIOUS_LINE = line
+                
+                if scorer is not None:
+                    scorer.add(tokens, fields)
+                
+                else:
+                    self._add_fields(FOUND_CONTACT, fields)
+        
+        if scorer is not None and FOUND_CONTACT is not None:
+            CURRENT_STATE = STATES.OUTSIDE_SIGNATURE
+            FOUND_CONTACT = None
+            SIGNATURE_LINE_COUNT = 0
+            self._keep_signature()
+        
+        if self.stats is not None:
+            self.stats.add("blank_lines", BLANK_LINES)
+            
+            for transition, count in TRANSITIONS.items():
+                self.stats.add("signatures_%s" % transition, count)
+            
+            if cache is not None:
+                self.stats.add("scan_cache_hits", cache.hits - hits)
+                self.stats.add("scan_cache_misses", cache.misses - misses)
+        
+        return CURRENT_STATE, FOUND_CONTACT, SIGNATURE_LINE_COUNT
+    
+    def _add_fields(self, contact, fields):
+        """
+        Add what was found on a line of a signature to the contact.
+        
+        :param fields:
+            As from :meth:`_scan_line`.
+        """
+        
+        skype, twitter, numbers, email, url, address = fields
+        
+        # First, let's look for a skype name, this is nice and simple.
+        if skype:
+            contact.skype = skype
+            # Don't look for anything else!
+            return
+        
+        # Next we look for twitter as that is also quite simple.  
+        if twitter:
+            contact.twitter = twitter
+            # Don't look for anything else!
+            return
+        
+        # Next we look for a phone number, and we know there might be more than one on
+        # a line, so...
+        if numbers:
+            # We might have more than one phone number so we store a list.
+            if contact.phone is None:
+                contact.phone = []
+            
+            # And this time we store the phone number as a :data:`PhoneNumber`.
+            for number in numbers:
+                if number not in contact.phone:
+                    contact.phone.append(number)
+        
+        # Now look for an email address...
+        if email:
+            # We might have more than one email so we store a list.  The first goes in
+            # a new list, as contacts are indexed on their first email.
+            if not contact.email:
+                contact.email = [email]
+            
+            elif email not in contact.email:
+                contact.email.append(email)
+        
+        # And last but not least, look for a url... 
+        if url and "@" not in url:
+            # We might have more than one url so we store a list.
+            if contact.url is None:
+                contact.url = []
+            
+            if url not in contact.url:
+                contact.url.append(url)
+        
+        # And an address, which we keep as one string.
+        if address:
+            street, locality = address
+            value = locality if street is None else "%s, %s" % (street, locality)
+            
+            if contact.address is None:
+                contact.address = []
+            
+            if value not in contact.address:
+                contact.address.append(value)
+    
+    def _keep_signature(self):
+        """
+        The signature we were in has ended, if it scores well enough with our
+        :attr:`scorer` add what was found in it to the contact.
+        """
+        
+        contact, fields = self.scorer.finish()
+        
+        if contact is None:
+            return
+        
+        if self._found is not None:
+            self._found.append(contact)
+        
+        for line in fields:
+            self._add_fields(contact, line)
+    
+    def _scan_line(self, line):
+        """
+        Look for all of the signature fields in a line in one go.  Gives the same
+        results as calling each of the ``_match_*`` methods in turn, but each
+        pattern is only run if a cheap check says it could possibly match (every
+        phone number needs a digit, every email an '@' and so on), so most lines
+        only get looked at once or twice.
+        
+        :param line:
+            A line from the file.
+        :returns:
+            A tuple of (skype, twitter, phone numbers, email, url, address).  Fields
+            that aren't found are None, or an empty list for the phone numbers.
+            The address is a tuple, see :meth:`Gazetteer.find_address`.
+        """
+        
+        skype = twitter = email = url = address = None
+        numbers = []
+        
+        if "kype:" in line:
+            match = SKYPE_USERNAME_REGEX.search(line)
+            if match:
+                skype = match.group("skype")
+        
+        if "witter" in line or line.startswith("@"):
+            match = TWITTER_USERNAME_REGEX.search(line)
+            if match:
+                twitter = match.group("twitter")
+        
+        if DIGIT_REGEX.search(line):
+            numbers = self._match_phone(line)
+            address = self._match_address(line)
+        
+        if "@" in line:
+            match = EMAIL_REGEX.search(line)
+            if match:
+                email = match.group("email")
+        
+        if "." in line:
+            match = URL_RE.search(line)
+            if match:
+                url = match.group("url")
+        
+        return skype, twitter, numbers, email, url, address
+    
+    def _scan_line_counted(self, line):
+        """
+        :meth:`_scan_line`, also counting in :attr:`stats` how often each field's
+        pattern is run and how often it finds something.  The checks for which
+        patterns get run must be kept the same as those in :meth:`_scan_line`.
+        """
+        
+        fields = self._scan_line(line)
+        digits = DIGIT_REGEX.search(line) is not None
+        checks = ("kype:" in line, "witter" in line or line.startswith("@"), digits, "@" in line, "." in line, digits)
+        
+        for name, checked, found in zip(_SIGNATURE_FIELDS, checks, fields):
+            if checked:
+                self.stats.add("%s_calls" % name)
+                
+                if found:
+                    self.stats.add("%s_hits" % name)
+        
+        return fields
     
     def _match_skype(self, line):
-        skype_match = re.search(SKYPE_USERNAME_REGEX, line)
+        skype_match = SKYPE_USERNAME_REGEX.search(line)
         if skype_match:
             return skype_match.groupdict()["skype"]
     
     def _match_twitter(self, line):
-        twit_match = re.search(TWITTER_USERNAME_REGEX, line)
+        twit_match = TWITTER_USERNAME_REGEX.search(line)
         if twit_match:
             return twit_match.groupdict()["twitter"]
     
     def _match_phone(self, line):
-        def find_phone_number_type(in_):
-            """
-            Function to try and work out what type of phone number we have...
-            """
-            
-            if in_ in ("(M) ", "Cell/Mobile: ", "m: ", "Mobile: ", " M "):
-                return "mobile"
-            
-            if in_ in ("(F) ", "f: ", "Fax: ", " F "):
-                return "fax"
-            
-            return "work"
-        
         numbers = []
         
-        for phone_match in re.finditer(PHONE_REGEX, line):
-            number_type = find_phone_number_type(phone_match.groupdict()["type"])
-            number = {"type":number_type, "number":phone_match.groupdict()["number"]}
+        for phone_match in PHONE_REGEX.finditer(line):
+            # Try and work out what type of phone number we have...
+            number_type = PHONE_NUMBER_TYPES.get(phone_match.groupdict()["type"], "work")
+            number = PhoneNumber(number_type, phone_match.groupdict()["number"])
             
             if number not in numbers:
                 numbers.append(number)
@@ -529,19 +3715,161 @@ class Extractor(object):
         return numbers
     
     def _match_email(self, line):
-        email_match = re.search(EMAIL_REGEX, line)
+        email_match = EMAIL_REGEX.search(line)
         if email_match:
             return email_match.groupdict()["email"]
     
     def _match_url(self, line):
-        url_match = re.search(URL_RE, line)
+        url_match = URL_RE.search(line)
         if url_match:
             return url_match.groupdict()["url"]
     
-    def dump(self, format):
+    def _match_address(self, line):
+        if self.gazetteer is None:
+            self.gazetteer = Gazetteer.load()
+        
+        return self.gazetteer.find_address(line)
+    
+    def dump(self, format, output=None, batch_size=WRITER_BATCH_SIZE):
         """
-        Dump all the contacts we have found to a vCard format!
+        Dump all the contacts we have found to a vCard format!  Or a dict, or
+        NDJSON (one JSON object per line) for loading in to something else.
+        
+        :param format:
+            One of "vcard", "dict" or "ndjson".
+        :param output:
+            A file-like object to write to, by default stdout.
+        :param batch_size:
+            How many contacts to write at a time, see :class:`ContactWriter`.
         """
         
-        for contact in self._contacts:
-            print contact.dump(format=format)
+        with self._stage("dump"):
+            ContactWriter(output or sys.stdout, format, batch_size).write_all(self._contacts)
+
+# The following are run by the worker processes when parsing in parallel, see
+# :meth:`Extractor._parse_parallel`.  They live out here so they can be pickled.
+
+_WORKER_STATE = {}
+_SIGNATURE_FIELDS = ("skype", "twitter", "phone", "email", "url", "address")
+
+def _init_worker(state):
+    """
+    Set up a worker process with the state shared by all of its tasks.
+    """
+    
+    _WORKER_STATE.clear()
+    _WORKER_STATE.update(state)
+
+def _read_shard(shard):
+    """
+    Generator yielding the lines of a shard, from :meth:`Extractor._find_shards`.
+    """
+    
+    if not isinstance(shard, tuple):
+        for line in shard:
+            yield line
+        
+        return
+    
+    filename, start, end = shard
+    
+    for line in MappedFile(filename).lines(start, end):
+        yield line
+
+def _shard_extractor(shard):
+    """
+    Make an :class:`Extractor` streaming the given shard.
+    """
+    
+    extract = Extractor(stats=_WORKER_STATE.get("stats", False))
+    extract.load(_read_shard(shard), stream=True)
+    
+    return extract
+
+def _worker_stats(extract):
+    """
+    The stats kept by a worker's :class:`Extractor` to send back, if any.
+    """
+    
+    if extract.stats is None:
+        return None
+    
+    return extract.stats.as_dict()
+
+def _parallel_count_lines(shard):
+    
+    extract = _shard_extractor(shard)
+    
+    return extract._count_lines(extract._prepare_lines(_WORKER_STATE["ignore_threads"], blocks=False))
+
+def _parallel_find_names(shards):
+    """
+    :param shards:
+        A list of shards.
+    :returns:
+        A tuple of the contacts found and the stats (if kept).
+    """
+    
+    state = _WORKER_STATE
+    extract = Extractor(stats=state["stats"])
+    extract._contacts.stats = extract.stats
+    extract._remove_blocks = state["remove_blocks"]
+    
+    for shard in shards:
+        extract.load(_read_shard(shard), stream=True)
+        
+        for line in extract._find_names(extract._prepare_lines(state["ignore_threads"], state["frequency"], state["threshold"])):
+            pass
+    
+    return list(extract._contacts), _worker_stats(extract)
+
+def _parallel_find_signatures(task):
+    """
+    :param task:
+        A tuple of a list of shards and the (frozen) signature state to start
+        the first in, see :meth:`Extractor._freeze_state`.  The others start
+        outside of a signature.
+    :returns:
+        A tuple of a list of (position, details) for each contact that changed,
+        where details is a dictionary of the signature fields that changed, the
+        gate counts, the scorer counts (if scoring), the (frozen) signature
+        state at the end of the last shard and the stats (if kept).
+    """
+    
+    import cPickle
+    
+    shards, frozen = task
+    state = _WORKER_STATE
+    extract = Extractor(stats=state["stats"])
+    extract._contacts = cPickle.loads(state["contacts"])
+    extract._contacts.stats = extract.stats
+    extract._remove_blocks = state["remove_blocks"]
+    
+    if state["scorer"] is not None:
+        extract.scorer = SignatureScorer(*state["scorer"])
+    
+    # Take copies of the lists, as they get appended to.
+    before = [[list(value) if isinstance(value, list) else value for value in [getattr(contact, field, None) for field in _SIGNATURE_FIELDS]] for contact in extract._contacts]
+    
+    final = extract._thaw_state(frozen)
+    
+    for position, shard in enumerate(shards):
+        extract.load(_read_shard(shard), stream=True)
+        final = extract._find_signatures(extract._prepare_lines(state["ignore_threads"], state["frequency"], state["threshold"], tally=True), final if position == 0 else None)
+    
+    changes = []
+    
+    for position, contact in enumerate(extract._contacts):
+        details = {}
+        
+        for field, old in zip(_SIGNATURE_FIELDS, before[position]):
+            value = getattr(contact, field, None)
+            if value is not None and value != old:
+                details[field] = value
+        
+        if details:
+            changes.append((position, details))
+    
+    scores = None if extract.scorer is None else extract.scorer.counts()
+    
+    return changes, extract.gate.counts(), scores, extract._freeze_state(final), _worker_stats(extract)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2011 Mark Streatfield <mstreatfield@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+from __future__ import with_statement
+
+import BaseHTTPServer
+import cStringIO
+import os
+import SocketServer
+import stat
+import sys
+import threading
+import urlparse
+
+import zeromail
+
+MAX_PENDING = 16 # Requests we'll hold on to at once, any more are turned away.
+MAX_MESSAGE_SIZE = 10 * 1024 * 1024 # Largest message we'll accept, in bytes.
+CONTENT_TYPES = {"dict": "text/plain", "ndjson": "application/x-ndjson", "vcard": "text/vcard"}
+
+class ExtractionService(object):
+    """
+    The state shared by every request to the server: one :class:`zeromail.Extractor`
+    that all messages go through, so the names found in one message help with
+    the next (and the contacts build up), and a limit on how many requests can
+    be waiting on it at once.
+    
+    As each message builds on the contacts from those before it, messages are
+    extracted one at a time, under a lock.  Only reading requests and writing
+    responses happen alongside each other, in the server's threads, so more
+    threads (or a pool) won't get through messages any quicker.
+    """
+    
+    def __init__(self, max_pending=MAX_PENDING):
+        """
+        Initialise the object.
+        
+        :param max_pending:
+            How many requests can be waiting for (or using) the extractor at once.
+        """
+        
+        self.extractor = zeromail.Extractor()
+        self._lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(max_pending)
+    
+    def acquire(self):
+        """
+        Take a place in the queue, if there is one.
+        
+        :returns:
+            True if there was, in which case :meth:`release` must be called when
+            done, otherwise False.
+        """
+        
+        return self._pending.acquire(False)
+    
+    def release(self):
+        
+        self._pending.release()
+    
+    def extract(self, message, format):
+        """
+        Extract the contacts from a message.
+        
+        :returns:
+            The contacts named in the message, dumped in the given format.
+        """
+        
+        with self._lock:
+            return self._dump(self.extractor.extract_message(message), format)
+    
+    def contacts(self, format):
+        """
+        :returns:
+            All the contacts found so far, dumped in the given format.
+        """
+        
+        with self._lock:
+            return self._dump(self.extractor._contacts, format)
+    
+    def _dump(self, contacts, format):
+        
+        # Dumped while we hold the lock, so the contacts can't change under us,
+        # then written out after so a slow client doesn't hold anyone else up.
+        output = cStringIO.StringIO()
+        zeromail.ContactWriter(output, format).write_all(contacts)
+        
+        return output.getvalue()
+
+class ExtractionHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Handles the requests to the server:
+    
+        POST /extract?format=ndjson    The message is the body, gives its contacts.
+        GET /contacts?format=ndjson    Gives all the contacts found so far.
+    
+    The format is one of those :meth:`zeromail.Contact.dump` supports, ndjson
+    by default.
+    """
+    
+    server_version = "zeromail/0.0.1"
+    
+    def do_POST(self):
+        
+        path, format = self._parse_path()
+        if path is None:
+            return
+        
+        if path != "/extract":
+            return self.send_error(404)
+        
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            return self.send_error(411)
+        
+        # A negative length would have us read until the client hangs up.
+        if length < 0:
+            return self.send_error(400, "Bad Content-Length.")
+        
+        if length > MAX_MESSAGE_SIZE:
+            return self.send_error(413)
+        
+        service = self.server.service
+        
+        # Turn the request away now rather than let them pile up, the client can
+        # try again later.
+        if not service.acquire():
+            return self.send_error(503, "Too many requests, try again later.")
+        
+        try:
+            body = service.extract(self.rfile.read(length), format)
+        finally:
+            service.release()
+        
+        self._send(body, format)
+    
+    def do_GET(self):
+        
+        path, format = self._parse_path()
+        if path is None:
+            return
+        
+        if path != "/contacts":
+            return self.send_error(404)
+        
+        self._send(self.server.service.contacts(format), format)
+    
+    def _parse_path(self):
+        """
+        :returns:
+            A tuple of the path and the format asked for, or (None, None) if the
+            format isn't one we know (and the error has been sent).
+        """
+        
+        url = urlparse.urlparse(self.path)
+        format = urlparse.parse_qs(url.query).get("format", ["ndjson"])[-1]
+        
+        if format not in CONTENT_TYPES:
+            self.send_error(400, "Unknown format, use one of %s." % ", ".join(sorted(CONTENT_TYPES)))
+            return None, None
+        
+        return url.path, format
+    
+    def _send(self, body, format):
+        
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[format])
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def address_string(self):
+        
+        # Unix sockets don't have an address, and we don't want a DNS lookup
+        # for every request on TCP ones.
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        
+        return "local"
+    
+    def log_message(self, format, *args):
+        
+        # As the default, but without assuming the client has an address.
+        sys.stderr.write("%s - - [%s] %s\n" % (self.address_string(), self.log_date_time_string(), format % args))
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    
+    daemon_threads = True
+
+class ThreadingUnixHTTPServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    
+    daemon_threads = True
+    
+    def server_bind(self):
+        
+        # Clear out a socket left behind by an earlier run, but nothing else.
+        if os.path.exists(self.server_address):
+            if not stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+                raise Exception("%s exists and isn't a socket." % self.server_address)
+            
+            os.remove(self.server_address)
+        
+        SocketServer.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+def make_server(address, max_pending=MAX_PENDING):
+    """
+    Make (but don't start) a server.
+    
+    :param address:
+        Either "host:port" to listen for HTTP on, or the path of a Unix socket to
+        listen for HTTP on instead.
+    :param max_pending:
+        How many requests can be waiting at once, see :class:`ExtractionService`.
+    """
+    
+    host, separator, port = address.rpartition(":")
+    
+    if separator and "/" not in address:
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), ExtractionHandler)
+    else:
+        server = ThreadingUnixHTTPServer(address, ExtractionHandler)
+    
+    server.service = ExtractionService(max_pending)
+    
+    return server
+
+def serve(address, max_pending=MAX_PENDING):
+    """
+    Run a server until interrupted.  Everything is set up once, up front, so
+    each request only pays for the extraction itself.  For example:
+    
+        extract --serve 127.0.0.1:8025
+        curl --data-binary @message.txt http://127.0.0.1:8025/extract
+    
+    See :func:`make_server` for the arguments and :class:`ExtractionHandler`
+    for what the server does.
+    """
+    
+    server = make_server(address, max_pending)
+    
+    try:
+        server.serve_forever()
+    
+    except KeyboardInterrupt:
+        pass
+    
+    finally:
+        server.server_close()
+        
+        if isinstance(server, ThreadingUnixHTTPServer) and os.path.exists(address):
+            os.remove(address)